@@ -6,16 +6,23 @@ Retrieves CloudWatch metrics for DynamoDB tables
 import boto3
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 
-from utils.cloudwatch_helper import CloudWatchHelper, parse_time_range, calculate_period
+from utils.cloudwatch_helper import CLIENT_CONFIG, TIME_RANGE_WINDOW_SECONDS, CloudWatchHelper, parse_time_range, calculate_period, reduce_datapoints, LAYOUTS, to_columnar_metrics
 from utils.response_helper import success_response, error_response, not_found_response
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
+# Clients are created once per container and reused across invocations
+_SESSION = boto3.session.Session()
+_DDB = _SESSION.client('dynamodb', config=CLIENT_CONFIG)
+_CW_HELPER = CloudWatchHelper()
+
 # DynamoDB metrics to retrieve
 DYNAMODB_METRICS = [
     'ConsumedReadCapacityUnits',
@@ -33,6 +40,13 @@ DYNAMODB_METRICS = [
     'ReturnedBytes'
 ]
 
+# Statistics requested per metric; counters only need Sum
+METRIC_STATS = {
+    'ProvisionedReadCapacityUnits': ['Average'],
+    'ProvisionedWriteCapacityUnits': ['Average'],
+    'SuccessfulRequestLatency': ['Average', 'Maximum', 'SampleCount']
+}
+
 # Operation-specific metrics
 OPERATION_METRICS = [
     'GetItem',
@@ -43,35 +57,82 @@ OPERATION_METRICS = [
     'UpdateItem'
 ]
 
+# Metrics used by the all-tables summary
+TABLE_SUMMARY_METRICS = [
+    'ConsumedReadCapacityUnits',
+    'ConsumedWriteCapacityUnits',
+    'ReadThrottleEvents',
+    'WriteThrottleEvents'
+]
+
+# Table list cache, reused across warm invocations of the same container
+TABLE_CACHE_TTL_SECONDS = 300
+_TABLE_CACHE = {'value': None, 'expires': 0}
+
+# Maximum number of concurrent DescribeTable calls
+DESCRIBE_CONCURRENCY = 32
+
+
+def describe_table_summary(table_name: str) -> Dict[str, Any]:
+    """Describe a single DynamoDB table, returning an error entry on failure"""
+    try:
+        table_info = _DDB.describe_table(TableName=table_name)['Table']
+        return {
+            'name': table_name,
+            'status': table_info.get('TableStatus'),
+            'item_count': table_info.get('ItemCount', 0),
+            'size_bytes': table_info.get('TableSizeBytes', 0),
+            'billing_mode': table_info.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+        }
+    except Exception as e:
+        logger.warning("Could not describe table %s: %s", table_name, e)
+        return {'name': table_name, 'error': str(e)}
+
+
+def iter_all_tables() -> Iterator[str]:
+    """Iterate over all DynamoDB table names, one page at a time"""
+    paginator = _DDB.get_paginator('list_tables')
+    for page in paginator.paginate():
+        yield from page.get('TableNames', [])
+
+
+def describe_tables_parallel(table_names: Iterable[str]) -> List[Dict[str, Any]]:
+    """Describe DynamoDB tables concurrently, preserving input order"""
+    # DescribeTable calls are independent, so fan them out on the shared client
+    with ThreadPoolExecutor(max_workers=DESCRIBE_CONCURRENCY) as executor:
+        return list(executor.map(describe_table_summary, table_names))
+
 
 def get_all_tables() -> List[Dict[str, Any]]:
     """Get list of all DynamoDB tables with basic info"""
-    dynamodb = boto3.client('dynamodb')
-    tables = []
-    
-    paginator = dynamodb.get_paginator('list_tables')
-    for page in paginator.paginate():
-        for table_name in page.get('TableNames', []):
-            try:
-                table_info = dynamodb.describe_table(TableName=table_name)['Table']
-                tables.append({
-                    'name': table_name,
-                    'status': table_info.get('TableStatus'),
-                    'item_count': table_info.get('ItemCount', 0),
-                    'size_bytes': table_info.get('TableSizeBytes', 0),
-                    'billing_mode': table_info.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
-                })
-            except Exception as e:
-                logger.warning(f"Could not describe table {table_name}: {str(e)}")
-                tables.append({'name': table_name, 'error': str(e)})
+    return describe_tables_parallel(iter_all_tables())
+
+
+def get_all_tables_cached(ttl: int = TABLE_CACHE_TTL_SECONDS) -> List[Dict[str, Any]]:
+    """Get list of all DynamoDB tables, reusing the last result for up to ttl seconds"""
+    now = time.monotonic()
+    if now < _TABLE_CACHE['expires']:
+        return _TABLE_CACHE['value']
     
+    tables = get_all_tables()
+    _TABLE_CACHE.update(value=tables, expires=now + ttl)
     return tables
 
 
+def table_exists(table_name: str) -> bool:
+    """Check whether a DynamoDB table exists without listing all tables"""
+    try:
+        _DDB.describe_table(TableName=table_name)
+    except _DDB.exceptions.ResourceNotFoundException:
+        return False
+    return True
+
+
 def get_table_metrics(
     table_name: str,
     hours: int = 24,
-    include_operations: bool = False
+    include_operations: bool = False,
+    cw_helper: Optional[CloudWatchHelper] = None
 ) -> Dict[str, Any]:
     """
     Get CloudWatch metrics for a specific DynamoDB table
@@ -80,87 +141,86 @@ def get_table_metrics(
         table_name: Name of the DynamoDB table
         hours: Number of hours to look back
         include_operations: Whether to include per-operation metrics
+        cw_helper: Optional CloudWatchHelper to reuse
     
     Returns:
         Dictionary containing table metrics
     """
-    cw_helper = CloudWatchHelper()
-    start_time, end_time = parse_time_range(hours)
+    if cw_helper is None:
+        cw_helper = _CW_HELPER
     period = calculate_period(hours)
+    start_time, end_time = parse_time_range(hours, TIME_RANGE_WINDOW_SECONDS)
     
     metrics_data = {
         'table_name': table_name,
         'metrics': {},
         'time_range': {
-            'start': start_time.isoformat(),
-            'end': end_time.isoformat(),
+            'start': start_time,
+            'end': end_time,
             'hours': hours
         }
     }
     
-    # Get table-level metrics
-    for metric_name in DYNAMODB_METRICS:
-        try:
-            dimensions = [
-                {'Name': 'TableName', 'Value': table_name}
-            ]
-            
-            result = cw_helper.get_metric_statistics(
-                namespace='AWS/DynamoDB',
-                metric_name=metric_name,
-                dimensions=dimensions,
-                start_time=start_time,
-                end_time=end_time,
-                period=period,
-                statistics=['Sum', 'Average', 'Maximum', 'Minimum']
-            )
-            
-            if result['datapoints']:
-                metrics_data['metrics'][metric_name] = result
-        except Exception as e:
-            logger.warning(f"Could not get {metric_name} for {table_name}: {str(e)}")
+    # Build one batched request for table-level metrics
+    table_dimensions = [{'Name': 'TableName', 'Value': table_name}]
+    metric_requests = {
+        metric_name: {
+            'namespace': 'AWS/DynamoDB',
+            'metric_name': metric_name,
+            'dimensions': table_dimensions,
+            'statistics': METRIC_STATS.get(metric_name, ['Sum'])
+        }
+        for metric_name in DYNAMODB_METRICS
+    }
     
-    # Get operation-specific metrics if requested
+    # Add operation-specific metrics if requested
     if include_operations:
         for operation in OPERATION_METRICS:
-            try:
-                dimensions = [
+            metric_requests[f'Latency_{operation}'] = {
+                'namespace': 'AWS/DynamoDB',
+                'metric_name': 'SuccessfulRequestLatency',
+                'dimensions': [
                     {'Name': 'TableName', 'Value': table_name},
                     {'Name': 'Operation', 'Value': operation}
-                ]
-                
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/DynamoDB',
-                    metric_name='SuccessfulRequestLatency',
-                    dimensions=dimensions,
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Average', 'Maximum', 'Minimum', 'SampleCount']
-                )
-                
-                if result['datapoints']:
-                    metrics_data['metrics'][f'Latency_{operation}'] = result
-            except Exception as e:
-                logger.warning(f"Could not get operation metric for {operation}: {str(e)}")
+                ],
+                'statistics': METRIC_STATS['SuccessfulRequestLatency']
+            }
+    
+    try:
+        results = cw_helper.get_metric_statistics_batch(
+            metric_requests,
+            start_time=start_time,
+            end_time=end_time,
+            period=period
+        )
+        
+        for key, result in results.items():
+            if result['datapoints']:
+                metrics_data['metrics'][key] = result
+    except Exception as e:
+        logger.warning("Could not get metrics for %s: %s", table_name, e)
     
     return metrics_data
 
 
-def get_all_tables_summary(hours: int = 24) -> Dict[str, Any]:
+def get_all_tables_summary(
+    hours: int = 24,
+    cw_helper: Optional[CloudWatchHelper] = None
+) -> Dict[str, Any]:
     """
     Get summary metrics for all DynamoDB tables
     
     Args:
         hours: Number of hours to look back
+        cw_helper: Optional CloudWatchHelper to reuse
     
     Returns:
         Dictionary containing summary for all tables
     """
-    tables = get_all_tables()
-    cw_helper = CloudWatchHelper()
-    start_time, end_time = parse_time_range(hours)
-    period = calculate_period(hours)
+    tables = get_all_tables_cached()
+    if cw_helper is None:
+        cw_helper = _CW_HELPER
+    start_time, end_time = parse_time_range(hours, TIME_RANGE_WINDOW_SECONDS)
     
     summary = {
         'total_tables': len(tables),
@@ -175,6 +235,39 @@ def get_all_tables_summary(hours: int = 24) -> Dict[str, Any]:
         'time_range_hours': hours
     }
     
+    # Build one batched request covering every (table, metric) pair
+    # Statistics list is shared by every query rather than rebuilt per metric
+    statistics = ['Sum']
+    metric_requests = {}
+    for table in tables:
+        if 'error' in table:
+            continue
+        
+        table_name = table['name']
+        dimensions = [{'Name': 'TableName', 'Value': table_name}]
+        for metric_name in TABLE_SUMMARY_METRICS:
+            metric_requests[(table_name, metric_name)] = {
+                'namespace': 'AWS/DynamoDB',
+                'metric_name': metric_name,
+                'dimensions': dimensions,
+                'statistics': statistics
+            }
+    
+    results = {}
+    metrics_error = None
+    try:
+        # Only window totals are needed, so let CloudWatch aggregate the whole
+        # range into a single datapoint per series
+        results = cw_helper.get_metric_statistics_batch(
+            metric_requests,
+            start_time=start_time,
+            end_time=end_time,
+            period=hours * 3600
+        )
+    except Exception as e:
+        logger.warning("Could not get metrics for tables: %s", e)
+        metrics_error = str(e)
+    
     for table in tables:
         if 'error' in table:
             summary['tables'].append(table)
@@ -195,48 +288,26 @@ def get_all_tables_summary(hours: int = 24) -> Dict[str, Any]:
         summary['aggregated']['total_size_bytes'] += table.get('size_bytes', 0)
         summary['aggregated']['total_items'] += table.get('item_count', 0)
         
-        try:
-            # Get consumed capacity metrics
-            for metric_name in ['ConsumedReadCapacityUnits', 'ConsumedWriteCapacityUnits']:
-                dimensions = [{'Name': 'TableName', 'Value': table_name}]
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/DynamoDB',
-                    metric_name=metric_name,
-                    dimensions=dimensions,
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                
-                total = sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                if 'Read' in metric_name:
-                    table_summary['read_capacity_consumed'] = total
-                    summary['aggregated']['total_read_capacity_consumed'] += total
-                else:
-                    table_summary['write_capacity_consumed'] = total
-                    summary['aggregated']['total_write_capacity_consumed'] += total
-            
-            # Get throttle events
-            for metric_name in ['ReadThrottleEvents', 'WriteThrottleEvents']:
-                dimensions = [{'Name': 'TableName', 'Value': table_name}]
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/DynamoDB',
-                    metric_name=metric_name,
-                    dimensions=dimensions,
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                
-                total = sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                table_summary['throttle_events'] += total
-                summary['aggregated']['total_throttle_events'] += total
+        if metrics_error:
+            table_summary['metrics_error'] = metrics_error
+            summary['tables'].append(table_summary)
+            continue
+        
+        totals = {
+            metric_name: reduce_datapoints(results[(table_name, metric_name)]['datapoints'], 'Sum')
+            for metric_name in TABLE_SUMMARY_METRICS
+        }
+        
+        # Consumed capacity
+        table_summary['read_capacity_consumed'] = totals['ConsumedReadCapacityUnits']
+        table_summary['write_capacity_consumed'] = totals['ConsumedWriteCapacityUnits']
+        summary['aggregated']['total_read_capacity_consumed'] += totals['ConsumedReadCapacityUnits']
+        summary['aggregated']['total_write_capacity_consumed'] += totals['ConsumedWriteCapacityUnits']
         
-        except Exception as e:
-            logger.warning(f"Could not get metrics for table {table_name}: {str(e)}")
-            table_summary['metrics_error'] = str(e)
+        # Throttle events
+        throttle_events = totals['ReadThrottleEvents'] + totals['WriteThrottleEvents']
+        table_summary['throttle_events'] = throttle_events
+        summary['aggregated']['total_throttle_events'] += throttle_events
         
         summary['tables'].append(table_summary)
     
@@ -254,7 +325,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns:
         API Gateway response
     """
-    logger.info(f"Received event: {event}")
+    logger.info("Received event: %s", event)
     
     try:
         # Parse path parameters
@@ -264,6 +335,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Parse query parameters
         query_params = event.get('queryStringParameters') or {}
         hours = int(query_params.get('hours', 24))
+        layout = query_params.get('layout', 'rows')
         include_operations = query_params.get('include_operations', 'false').lower() == 'true'
         
         # Validate hours parameter
@@ -273,22 +345,33 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 status_code=400
             )
         
+        # Validate layout parameter
+        if layout not in LAYOUTS:
+            return error_response(
+                message="Layout parameter must be 'rows' or 'columnar'",
+                status_code=400
+            )
+        
+        cw_helper = _CW_HELPER
+        
         if table_name:
             # Get metrics for specific table
-            logger.info(f"Getting metrics for table: {table_name}")
+            logger.info("Getting metrics for table: %s", table_name)
             
             # Verify table exists
-            tables = get_all_tables()
-            table_names = [t['name'] for t in tables]
-            if table_name not in table_names:
+            if not table_exists(table_name):
                 return not_found_response(f"Table '{table_name}'")
             
             metrics = get_table_metrics(
                 table_name=table_name,
                 hours=hours,
-                include_operations=include_operations
+                include_operations=include_operations,
+                cw_helper=cw_helper
             )
             
+            if layout == 'columnar':
+                metrics = to_columnar_metrics(metrics)
+            
             return success_response(
                 data=metrics,
                 message=f"DynamoDB metrics for table '{table_name}'"
@@ -296,7 +379,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             # Get summary for all tables
             logger.info("Getting metrics summary for all DynamoDB tables")
-            summary = get_all_tables_summary(hours)
+            summary = get_all_tables_summary(hours, cw_helper=cw_helper)
             
             return success_response(
                 data=summary,
@@ -304,7 +387,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             )
     
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
         return error_response(
             message=f"Error retrieving DynamoDB metrics: {str(e)}",
             status_code=500
@@ -4,18 +4,27 @@ Retrieves CloudWatch metrics for Lambda functions
 """
 
 import boto3
+import heapq
 import logging
 import os
+import time
+from dataclasses import dataclass
+from operator import attrgetter
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 
-from utils.cloudwatch_helper import CloudWatchHelper, parse_time_range, calculate_period
+from utils.cloudwatch_helper import CLIENT_CONFIG, TIME_RANGE_WINDOW_SECONDS, CloudWatchHelper, parse_time_range, calculate_period, reduce_datapoints, LAYOUTS, to_columnar_metrics
 from utils.response_helper import success_response, error_response, not_found_response
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
+# Clients are created once per container and reused across invocations
+_SESSION = boto3.session.Session()
+_LAMBDA = _SESSION.client('lambda', config=CLIENT_CONFIG)
+_CW_HELPER = CloudWatchHelper()
+
 # Lambda metrics to retrieve
 LAMBDA_METRICS = [
     'Invocations',
@@ -30,16 +39,49 @@ LAMBDA_METRICS = [
     'ProvisionedConcurrencySpilloverInvocations'
 ]
 
+# Statistics requested per metric; counters only need Sum
+LAMBDA_METRIC_STATS = {
+    'Duration': ['Average', 'Maximum', 'SampleCount'],
+    'ConcurrentExecutions': ['Maximum', 'Average'],
+    'IteratorAge': ['Average', 'Maximum']
+}
 
-def get_all_functions() -> List[Dict[str, Any]]:
-    """Get list of all Lambda functions with basic info"""
-    lambda_client = boto3.client('lambda')
-    functions = []
-    
-    paginator = lambda_client.get_paginator('list_functions')
+# All-functions summary spec:
+# (metric, statistic, reduction, function summary key, aggregated key)
+FUNCTION_SUMMARY_SPEC = [
+    ('Invocations', 'Sum', 'sum', 'invocations', 'total_invocations'),
+    ('Errors', 'Sum', 'sum', 'errors', 'total_errors'),
+    ('Throttles', 'Sum', 'sum', 'throttles', 'total_throttles'),
+    ('Duration', 'Average', 'mean', 'avg_duration_ms', None)
+]
+
+# Function list cache, reused across warm invocations of the same container
+FUNCTION_CACHE_TTL_SECONDS = 300
+_FUNCTION_CACHE = {'value': None, 'expires': 0}
+
+
+@dataclass(slots=True)
+class FunctionSummary:
+    """Per-function entry of the all-functions summary"""
+    name: str
+    runtime: Optional[str] = None
+    memory_size: int = 0
+    timeout: int = 0
+    code_size: int = 0
+    invocations: float = 0
+    errors: float = 0
+    throttles: float = 0
+    avg_duration_ms: float = 0
+    error_rate: float = 0
+    metrics_error: Optional[str] = None
+
+
+def iter_all_functions() -> Iterator[Dict[str, Any]]:
+    """Iterate over all Lambda functions with basic info, one page at a time"""
+    paginator = _LAMBDA.get_paginator('list_functions')
     for page in paginator.paginate():
         for func in page.get('Functions', []):
-            functions.append({
+            yield {
                 'name': func['FunctionName'],
                 'runtime': func.get('Runtime', 'N/A'),
                 'memory_size': func.get('MemorySize', 0),
@@ -47,14 +89,38 @@ def get_all_functions() -> List[Dict[str, Any]]:
                 'code_size': func.get('CodeSize', 0),
                 'last_modified': func.get('LastModified', ''),
                 'description': func.get('Description', '')
-            })
+            }
+
+
+def get_all_functions() -> List[Dict[str, Any]]:
+    """Get list of all Lambda functions with basic info"""
+    return list(iter_all_functions())
+
+
+def get_all_functions_cached(ttl: int = FUNCTION_CACHE_TTL_SECONDS) -> List[Dict[str, Any]]:
+    """Get list of all Lambda functions, reusing the last result for up to ttl seconds"""
+    now = time.monotonic()
+    if now < _FUNCTION_CACHE['expires']:
+        return _FUNCTION_CACHE['value']
     
+    functions = get_all_functions()
+    _FUNCTION_CACHE.update(value=functions, expires=now + ttl)
     return functions
 
 
+def function_exists(function_name: str) -> bool:
+    """Check whether a Lambda function exists without listing all functions"""
+    try:
+        _LAMBDA.get_function(FunctionName=function_name)
+    except _LAMBDA.exceptions.ResourceNotFoundException:
+        return False
+    return True
+
+
 def get_function_metrics(
     function_name: str,
-    hours: int = 24
+    hours: int = 24,
+    cw_helper: Optional[CloudWatchHelper] = None
 ) -> Dict[str, Any]:
     """
     Get CloudWatch metrics for a specific Lambda function
@@ -62,61 +128,59 @@ def get_function_metrics(
     Args:
         function_name: Name of the Lambda function
         hours: Number of hours to look back
+        cw_helper: Optional CloudWatchHelper to reuse
     
     Returns:
         Dictionary containing function metrics
     """
-    cw_helper = CloudWatchHelper()
-    start_time, end_time = parse_time_range(hours)
+    if cw_helper is None:
+        cw_helper = _CW_HELPER
     period = calculate_period(hours)
+    start_time, end_time = parse_time_range(hours, TIME_RANGE_WINDOW_SECONDS)
     
     metrics_data = {
         'function_name': function_name,
         'metrics': {},
         'time_range': {
-            'start': start_time.isoformat(),
-            'end': end_time.isoformat(),
+            'start': start_time,
+            'end': end_time,
             'hours': hours
         }
     }
     
-    # Get function-level metrics
-    for metric_name in LAMBDA_METRICS:
-        try:
-            dimensions = [
-                {'Name': 'FunctionName', 'Value': function_name}
-            ]
-            
-            # Use appropriate statistics based on metric type
-            if metric_name == 'Duration':
-                statistics = ['Average', 'Maximum', 'Minimum', 'SampleCount']
-            elif metric_name == 'ConcurrentExecutions':
-                statistics = ['Maximum', 'Average']
-            else:
-                statistics = ['Sum', 'Average', 'Maximum']
-            
-            result = cw_helper.get_metric_statistics(
-                namespace='AWS/Lambda',
-                metric_name=metric_name,
-                dimensions=dimensions,
-                start_time=start_time,
-                end_time=end_time,
-                period=period,
-                statistics=statistics
-            )
-            
+    # Build one batched request for function-level metrics
+    dimensions = [{'Name': 'FunctionName', 'Value': function_name}]
+    metric_requests = {
+        metric_name: {
+            'namespace': 'AWS/Lambda',
+            'metric_name': metric_name,
+            'dimensions': dimensions,
+            'statistics': LAMBDA_METRIC_STATS.get(metric_name, ['Sum'])
+        }
+        for metric_name in LAMBDA_METRICS
+    }
+    
+    try:
+        results = cw_helper.get_metric_statistics_batch(
+            metric_requests,
+            start_time=start_time,
+            end_time=end_time,
+            period=period
+        )
+        
+        for metric_name, result in results.items():
             if result['datapoints']:
                 metrics_data['metrics'][metric_name] = result
-        except Exception as e:
-            logger.warning(f"Could not get {metric_name} for {function_name}: {str(e)}")
+    except Exception as e:
+        logger.warning("Could not get metrics for %s: %s", function_name, e)
     
     # Calculate derived metrics
     if 'Invocations' in metrics_data['metrics'] and 'Errors' in metrics_data['metrics']:
         invocations_data = metrics_data['metrics']['Invocations']
         errors_data = metrics_data['metrics']['Errors']
         
-        total_invocations = sum(dp.get('Sum', 0) for dp in invocations_data.get('datapoints', []))
-        total_errors = sum(dp.get('Sum', 0) for dp in errors_data.get('datapoints', []))
+        total_invocations = reduce_datapoints(invocations_data.get('datapoints', []), 'Sum')
+        total_errors = reduce_datapoints(errors_data.get('datapoints', []), 'Sum')
         
         metrics_data['summary'] = {
             'total_invocations': total_invocations,
@@ -125,9 +189,17 @@ def get_function_metrics(
         }
         
         if 'Duration' in metrics_data['metrics']:
-            duration_data = metrics_data['metrics']['Duration']
-            avg_duration = sum(dp.get('Average', 0) for dp in duration_data.get('datapoints', [])) / max(len(duration_data.get('datapoints', [])), 1)
-            max_duration = max((dp.get('Maximum', 0) for dp in duration_data.get('datapoints', [])), default=0)
+            duration_datapoints = metrics_data['metrics']['Duration'].get('datapoints', [])
+            
+            # Single pass for both average and maximum duration
+            total_duration = 0
+            max_duration = 0
+            for dp in duration_datapoints:
+                total_duration += dp.get('Average', 0)
+                maximum = dp.get('Maximum', 0)
+                if maximum > max_duration:
+                    max_duration = maximum
+            avg_duration = total_duration / len(duration_datapoints) if duration_datapoints else 0
             
             metrics_data['summary']['avg_duration_ms'] = avg_duration
             metrics_data['summary']['max_duration_ms'] = max_duration
@@ -135,20 +207,26 @@ def get_function_metrics(
     return metrics_data
 
 
-def get_all_functions_summary(hours: int = 24) -> Dict[str, Any]:
+def get_all_functions_summary(
+    hours: int = 24,
+    cw_helper: Optional[CloudWatchHelper] = None,
+    top: int = 0
+) -> Dict[str, Any]:
     """
     Get summary metrics for all Lambda functions
     
     Args:
         hours: Number of hours to look back
+        cw_helper: Optional CloudWatchHelper to reuse
+        top: Only return the N most invoked functions (0 returns all)
     
     Returns:
         Dictionary containing summary for all functions
     """
-    functions = get_all_functions()
-    cw_helper = CloudWatchHelper()
-    start_time, end_time = parse_time_range(hours)
-    period = calculate_period(hours)
+    functions = get_all_functions_cached()
+    if cw_helper is None:
+        cw_helper = _CW_HELPER
+    start_time, end_time = parse_time_range(hours, TIME_RANGE_WINDOW_SECONDS)
     
     summary = {
         'total_functions': len(functions),
@@ -163,104 +241,86 @@ def get_all_functions_summary(hours: int = 24) -> Dict[str, Any]:
         'time_range_hours': hours
     }
     
-    error_rates = []
+    # Build one batched request covering every (function, metric) pair
+    # Statistics lists are shared by every query rather than rebuilt per metric
+    statistics = {metric_name: [stat] for metric_name, stat, *_ in FUNCTION_SUMMARY_SPEC}
+    metric_requests = {}
+    for func in functions:
+        function_name = func['name']
+        dimensions = [{'Name': 'FunctionName', 'Value': function_name}]
+        for metric_name in statistics:
+            metric_requests[(function_name, metric_name)] = {
+                'namespace': 'AWS/Lambda',
+                'metric_name': metric_name,
+                'dimensions': dimensions,
+                'statistics': statistics[metric_name]
+            }
+    
+    results = {}
+    metrics_error = None
+    try:
+        # Only window totals are needed, so let CloudWatch aggregate the whole
+        # range into a single datapoint per series
+        results = cw_helper.get_metric_statistics_batch(
+            metric_requests,
+            start_time=start_time,
+            end_time=end_time,
+            period=hours * 3600
+        )
+    except Exception as e:
+        logger.warning("Could not get metrics for functions: %s", e)
+        metrics_error = str(e)
+    
+    # Running totals for the average error rate
+    error_rate_sum = 0.0
+    error_rate_count = 0
     
     for func in functions:
         function_name = func['name']
-        function_summary = {
-            'name': function_name,
-            'runtime': func.get('runtime'),
-            'memory_size': func.get('memory_size'),
-            'timeout': func.get('timeout'),
-            'code_size': func.get('code_size', 0),
-            'invocations': 0,
-            'errors': 0,
-            'throttles': 0,
-            'avg_duration_ms': 0,
-            'error_rate': 0
-        }
+        function_summary = FunctionSummary(
+            name=function_name,
+            runtime=func.get('runtime'),
+            memory_size=func.get('memory_size'),
+            timeout=func.get('timeout'),
+            code_size=func.get('code_size', 0)
+        )
         
         summary['aggregated']['total_code_size_bytes'] += func.get('code_size', 0)
         
-        try:
-            # Get invocations
-            result = cw_helper.get_metric_statistics(
-                namespace='AWS/Lambda',
-                metric_name='Invocations',
-                dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                start_time=start_time,
-                end_time=end_time,
-                period=period,
-                statistics=['Sum']
-            )
-            invocations = sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-            function_summary['invocations'] = invocations
-            summary['aggregated']['total_invocations'] += invocations
-            
-            # Get errors
-            result = cw_helper.get_metric_statistics(
-                namespace='AWS/Lambda',
-                metric_name='Errors',
-                dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                start_time=start_time,
-                end_time=end_time,
-                period=period,
-                statistics=['Sum']
-            )
-            errors = sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-            function_summary['errors'] = errors
-            summary['aggregated']['total_errors'] += errors
-            
-            # Calculate error rate
-            if invocations > 0:
-                error_rate = (errors / invocations) * 100
-                function_summary['error_rate'] = round(error_rate, 2)
-                error_rates.append(error_rate)
-            
-            # Get throttles
-            result = cw_helper.get_metric_statistics(
-                namespace='AWS/Lambda',
-                metric_name='Throttles',
-                dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                start_time=start_time,
-                end_time=end_time,
-                period=period,
-                statistics=['Sum']
-            )
-            throttles = sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-            function_summary['throttles'] = throttles
-            summary['aggregated']['total_throttles'] += throttles
-            
-            # Get average duration
-            result = cw_helper.get_metric_statistics(
-                namespace='AWS/Lambda',
-                metric_name='Duration',
-                dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                start_time=start_time,
-                end_time=end_time,
-                period=period,
-                statistics=['Average']
-            )
-            if result.get('datapoints'):
-                avg_duration = sum(dp.get('Average', 0) for dp in result['datapoints']) / len(result['datapoints'])
-                function_summary['avg_duration_ms'] = round(avg_duration, 2)
+        if metrics_error:
+            function_summary.metrics_error = metrics_error
+            summary['functions'].append(function_summary)
+            continue
         
-        except Exception as e:
-            logger.warning(f"Could not get metrics for function {function_name}: {str(e)}")
-            function_summary['metrics_error'] = str(e)
+        for metric_name, statistic, op, summary_key, aggregate_key in FUNCTION_SUMMARY_SPEC:
+            value = reduce_datapoints(results[(function_name, metric_name)]['datapoints'], statistic, op)
+            setattr(function_summary, summary_key, round(value, 2))
+            if aggregate_key:
+                summary['aggregated'][aggregate_key] += value
+        
+        # Calculate error rate
+        invocations = function_summary.invocations
+        if invocations > 0:
+            error_rate = (function_summary.errors / invocations) * 100
+            function_summary.error_rate = round(error_rate, 2)
+            error_rate_sum += error_rate
+            error_rate_count += 1
         
         summary['functions'].append(function_summary)
     
     # Calculate average error rate
-    if error_rates:
-        summary['aggregated']['avg_error_rate'] = round(sum(error_rates) / len(error_rates), 2)
+    if error_rate_count:
+        summary['aggregated']['avg_error_rate'] = round(error_rate_sum / error_rate_count, 2)
     
-    # Sort functions by invocations (most active first)
-    summary['functions'] = sorted(
-        summary['functions'],
-        key=lambda x: x.get('invocations', 0),
-        reverse=True
-    )
+    # Sort functions by invocations (most active first); only the top N if requested
+    if top > 0:
+        summary['functions'] = heapq.nlargest(top, summary['functions'], key=attrgetter('invocations'))
+    else:
+        summary['functions'] = sorted(
+            summary['functions'],
+            key=attrgetter('invocations'),
+            reverse=True
+        )
     
     return summary
 
@@ -276,7 +336,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns:
         API Gateway response
     """
-    logger.info(f"Received event: {event}")
+    logger.info("Received event: %s", event)
     
     try:
         # Parse path parameters
@@ -286,6 +346,8 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Parse query parameters
         query_params = event.get('queryStringParameters') or {}
         hours = int(query_params.get('hours', 24))
+        layout = query_params.get('layout', 'rows')
+        top = int(query_params.get('top', 0))
         
         # Validate hours parameter
         if hours < 1 or hours > 720:  # Max 30 days
@@ -294,21 +356,39 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 status_code=400
             )
         
+        # Validate layout parameter
+        if layout not in LAYOUTS:
+            return error_response(
+                message="Layout parameter must be 'rows' or 'columnar'",
+                status_code=400
+            )
+        
+        # Validate top parameter
+        if top < 0:
+            return error_response(
+                message="Top parameter must be 0 or greater",
+                status_code=400
+            )
+        
+        cw_helper = _CW_HELPER
+        
         if function_name:
             # Get metrics for specific function
-            logger.info(f"Getting metrics for function: {function_name}")
+            logger.info("Getting metrics for function: %s", function_name)
             
             # Verify function exists
-            functions = get_all_functions()
-            function_names = [f['name'] for f in functions]
-            if function_name not in function_names:
+            if not function_exists(function_name):
                 return not_found_response(f"Function '{function_name}'")
             
             metrics = get_function_metrics(
                 function_name=function_name,
-                hours=hours
+                hours=hours,
+                cw_helper=cw_helper
             )
             
+            if layout == 'columnar':
+                metrics = to_columnar_metrics(metrics)
+            
             return success_response(
                 data=metrics,
                 message=f"Lambda metrics for function '{function_name}'"
@@ -316,7 +396,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         else:
             # Get summary for all functions
             logger.info("Getting metrics summary for all Lambda functions")
-            summary = get_all_functions_summary(hours)
+            summary = get_all_functions_summary(hours, cw_helper=cw_helper, top=top)
             
             return success_response(
                 data=summary,
@@ -324,7 +404,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             )
     
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}", exc_info=True)
+        logger.error("Error processing request: %s", e, exc_info=True)
         return error_response(
             message=f"Error retrieving Lambda metrics: {str(e)}",
             status_code=500
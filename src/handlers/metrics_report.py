@@ -7,63 +7,214 @@ import boto3
 import logging
 import os
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
-from utils.cloudwatch_helper import CloudWatchHelper, parse_time_range, calculate_period
-from utils.response_helper import success_response, error_response
+from utils.cloudwatch_helper import CLIENT_CONFIG, MAX_SEARCH_SERIES, TIME_RANGE_WINDOW_SECONDS, CloudWatchHelper, build_search_queries, parse_time_range, calculate_period
+from utils.response_helper import success_response, error_response, loads
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
+# Clients are created once per container and reused across invocations;
+# clients (unlike sessions) are safe to share between the summary threads.
+# Service clients are built on first use so a report for one service does
+# not pay for the others.
+_SESSION = boto3.session.Session()
+_CLIENTS: Dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+_CW_HELPER = CloudWatchHelper()
+
+# DynamoDB metrics and the statistic aggregated across tables
+DYNAMODB_SUMMARY_METRICS = {
+    'ConsumedReadCapacityUnits': 'Sum',
+    'ConsumedWriteCapacityUnits': 'Sum',
+    'ReadThrottleEvents': 'Sum',
+    'WriteThrottleEvents': 'Sum'
+}
+
+# Lambda metrics and the statistic aggregated across functions
+LAMBDA_SUMMARY_METRICS = {
+    'Invocations': 'Sum',
+    'Errors': 'Sum',
+    'Throttles': 'Sum',
+    'Duration': 'Average'
+}
+
+# Recommendation messages
+S3_LIFECYCLE_MSG = (
+    "Consider implementing S3 Lifecycle policies to manage storage costs for large buckets."
+)
+DDB_THROTTLE_TMPL = (
+    "DynamoDB throttling detected ({n} events). "
+    "Consider increasing provisioned capacity or switching to on-demand mode."
+)
+LAMBDA_ERROR_RATE_TMPL = (
+    "Lambda error rate is {rate}%. "
+    "Review CloudWatch logs to identify and fix recurring errors."
+)
+LAMBDA_THROTTLE_TMPL = (
+    "Lambda throttling detected ({n} events). "
+    "Consider requesting a concurrency limit increase."
+)
+LAMBDA_DURATION_TMPL = (
+    "Average Lambda duration is high ({ms}ms). "
+    "Consider optimizing function code or increasing memory allocation."
+)
+ALL_NORMAL_MSG = "All services are operating within normal parameters."
+
+# Resource listings change slowly; reuse them across warm invocations
+LIST_CACHE_TTL_SECONDS = 300
+_LIST_CACHE: Dict[str, Any] = {}
+
+
+def _cached(key: str, ttl: int, fn: Callable[[], Any]) -> Any:
+    """Return fn(), reusing the value cached under key for up to ttl seconds"""
+    now = time.monotonic()
+    entry = _LIST_CACHE.get(key)
+    if entry and now < entry[0]:
+        return entry[1]
+    
+    value = fn()
+    _LIST_CACHE[key] = (now + ttl, value)
+    return value
+
+
+def _client(service: str) -> Any:
+    """Get the shared client for a service, creating it on first use"""
+    client = _CLIENTS.get(service)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(service)
+            if client is None:
+                client = _CLIENTS[service] = _SESSION.client(service, config=CLIENT_CONFIG)
+    return client
+
+
+def _list_buckets() -> List[Dict[str, Any]]:
+    """List all S3 buckets"""
+    return _client('s3').list_buckets().get('Buckets', [])
+
+
+def _list_tables() -> List[str]:
+    """List all DynamoDB table names"""
+    tables = []
+    paginator = _client('dynamodb').get_paginator('list_tables')
+    for page in paginator.paginate():
+        tables.extend(page.get('TableNames', []))
+    return tables
+
+
+def _list_functions() -> List[Dict[str, Any]]:
+    """List all Lambda functions"""
+    functions = []
+    paginator = _client('lambda').get_paginator('list_functions')
+    for page in paginator.paginate():
+        functions.extend(page.get('Functions', []))
+    return functions
+
+
+def _get_search_totals(
+    cw_helper: CloudWatchHelper,
+    namespace: str,
+    dimension_name: str,
+    metrics: Dict[str, str],
+    start_time: datetime,
+    end_time: datetime,
+    period: int,
+    resource_count: int
+) -> Tuple[Dict[str, List[float]], bool]:
+    """
+    Fetch metrics aggregated across every resource in a namespace
+    
+    Sums are added up per timestamp and averages averaged, server-side, so
+    each metric comes back as a single series. The aggregates are partial
+    when there are more resources than one SEARCH can match, or when
+    CloudWatch flags a result as incomplete.
+    
+    Returns:
+        Tuple of (dictionary mapping metric name to its aggregated values,
+        whether the values may be partial)
+    """
+    metric_queries = []
+    query_metrics = {}
+    for i, (metric_name, statistic) in enumerate(metrics.items()):
+        query_id = f"m{i}"
+        query_metrics[query_id] = metric_name
+        metric_queries.extend(build_search_queries(
+            query_id,
+            namespace,
+            dimension_name,
+            metric_name,
+            statistic,
+            period,
+            aggregate='AVG' if statistic == 'Average' else 'SUM'
+        ))
+    
+    response = cw_helper.get_metric_data(metric_queries, start_time=start_time, end_time=end_time)
+    
+    values = {metric_name: [] for metric_name in metrics}
+    partial = resource_count > MAX_SEARCH_SERIES
+    for result in response['results']:
+        values[query_metrics[result['id']]] = result['values']
+        if result['messages'] or result['status_code'] == 'PartialData':
+            partial = True
+    
+    if partial:
+        logger.warning(f"Aggregated {namespace} metrics may be partial ({resource_count} resources)")
+    return values, partial
+
 
 def get_s3_summary(cw_helper: CloudWatchHelper, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
     """Get S3 metrics summary"""
-    s3_client = boto3.client('s3')
-    
     try:
-        buckets = s3_client.list_buckets().get('Buckets', [])
+        buckets = _cached('buckets', LIST_CACHE_TTL_SECONDS, _list_buckets)
         bucket_count = len(buckets)
         
+        # Limit to first 10 for performance; one batched request for all of them
+        metric_requests = {}
+        for bucket in buckets[:10]:
+            bucket_name = bucket['Name']
+            metric_requests[(bucket_name, 'BucketSizeBytes')] = {
+                'namespace': 'AWS/S3',
+                'metric_name': 'BucketSizeBytes',
+                'dimensions': [
+                    {'Name': 'BucketName', 'Value': bucket_name},
+                    {'Name': 'StorageType', 'Value': 'StandardStorage'}
+                ],
+                'statistics': ['Average']
+            }
+            metric_requests[(bucket_name, 'NumberOfObjects')] = {
+                'namespace': 'AWS/S3',
+                'metric_name': 'NumberOfObjects',
+                'dimensions': [
+                    {'Name': 'BucketName', 'Value': bucket_name},
+                    {'Name': 'StorageType', 'Value': 'AllStorageTypes'}
+                ],
+                'statistics': ['Average']
+            }
+        
+        results = cw_helper.get_metric_statistics_batch(
+            metric_requests,
+            start_time=start_time,
+            end_time=end_time,
+            period=86400
+        )
+        
         total_size = 0
         total_objects = 0
-        
-        for bucket in buckets[:10]:  # Limit to first 10 for performance
-            bucket_name = bucket['Name']
-            try:
-                for storage_type in ['StandardStorage']:
-                    result = cw_helper.get_metric_statistics(
-                        namespace='AWS/S3',
-                        metric_name='BucketSizeBytes',
-                        dimensions=[
-                            {'Name': 'BucketName', 'Value': bucket_name},
-                            {'Name': 'StorageType', 'Value': storage_type}
-                        ],
-                        start_time=start_time,
-                        end_time=end_time,
-                        period=86400,
-                        statistics=['Average']
-                    )
-                    if result.get('datapoints'):
-                        total_size += result['datapoints'][-1].get('Average', 0)
-                    
-                    result = cw_helper.get_metric_statistics(
-                        namespace='AWS/S3',
-                        metric_name='NumberOfObjects',
-                        dimensions=[
-                            {'Name': 'BucketName', 'Value': bucket_name},
-                            {'Name': 'StorageType', 'Value': 'AllStorageTypes'}
-                        ],
-                        start_time=start_time,
-                        end_time=end_time,
-                        period=86400,
-                        statistics=['Average']
-                    )
-                    if result.get('datapoints'):
-                        total_objects += result['datapoints'][-1].get('Average', 0)
-            except Exception as e:
-                logger.warning(f"Error getting S3 metrics for {bucket_name}: {e}")
+        for (bucket_name, metric_name), result in results.items():
+            if not result['datapoints']:
+                continue
+            latest = result['datapoints'][-1].get('Average', 0)
+            if metric_name == 'BucketSizeBytes':
+                total_size += latest
+            else:
+                total_objects += latest
         
         return {
             'bucket_count': bucket_count,
@@ -79,65 +230,27 @@ def get_s3_summary(cw_helper: CloudWatchHelper, start_time: datetime, end_time:
 
 def get_dynamodb_summary(cw_helper: CloudWatchHelper, start_time: datetime, end_time: datetime, period: int) -> Dict[str, Any]:
     """Get DynamoDB metrics summary"""
-    dynamodb = boto3.client('dynamodb')
-    
     try:
-        tables = []
-        paginator = dynamodb.get_paginator('list_tables')
-        for page in paginator.paginate():
-            tables.extend(page.get('TableNames', []))
-        
+        tables = _cached('tables', LIST_CACHE_TTL_SECONDS, _list_tables)
         table_count = len(tables)
-        total_read_consumed = 0
-        total_write_consumed = 0
-        total_throttles = 0
         
-        for table_name in tables[:20]:  # Limit for performance
-            try:
-                # Read capacity
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/DynamoDB',
-                    metric_name='ConsumedReadCapacityUnits',
-                    dimensions=[{'Name': 'TableName', 'Value': table_name}],
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                total_read_consumed += sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                
-                # Write capacity
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/DynamoDB',
-                    metric_name='ConsumedWriteCapacityUnits',
-                    dimensions=[{'Name': 'TableName', 'Value': table_name}],
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                total_write_consumed += sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                
-                # Throttles
-                for metric in ['ReadThrottleEvents', 'WriteThrottleEvents']:
-                    result = cw_helper.get_metric_statistics(
-                        namespace='AWS/DynamoDB',
-                        metric_name=metric,
-                        dimensions=[{'Name': 'TableName', 'Value': table_name}],
-                        start_time=start_time,
-                        end_time=end_time,
-                        period=period,
-                        statistics=['Sum']
-                    )
-                    total_throttles += sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-            except Exception as e:
-                logger.warning(f"Error getting DynamoDB metrics for {table_name}: {e}")
+        # One SEARCH per metric aggregates every table server-side
+        values, partial = _get_search_totals(
+            cw_helper, 'AWS/DynamoDB', 'TableName', DYNAMODB_SUMMARY_METRICS,
+            start_time, end_time, period, table_count
+        )
+        totals = {metric_name: sum(series) for metric_name, series in values.items()}
+        
+        total_read_consumed = totals['ConsumedReadCapacityUnits']
+        total_write_consumed = totals['ConsumedWriteCapacityUnits']
+        total_throttles = totals['ReadThrottleEvents'] + totals['WriteThrottleEvents']
         
         return {
             'table_count': table_count,
             'total_read_capacity_consumed': round(total_read_consumed, 2),
             'total_write_capacity_consumed': round(total_write_consumed, 2),
             'total_throttle_events': int(total_throttles),
+            'partial_data': partial,
             'status': 'healthy' if total_throttles == 0 else 'warning'
         }
     except Exception as e:
@@ -147,75 +260,21 @@ def get_dynamodb_summary(cw_helper: CloudWatchHelper, start_time: datetime, end_
 
 def get_lambda_summary(cw_helper: CloudWatchHelper, start_time: datetime, end_time: datetime, period: int) -> Dict[str, Any]:
     """Get Lambda metrics summary"""
-    lambda_client = boto3.client('lambda')
-    
     try:
-        functions = []
-        paginator = lambda_client.get_paginator('list_functions')
-        for page in paginator.paginate():
-            functions.extend(page.get('Functions', []))
-        
+        functions = _cached('functions', LIST_CACHE_TTL_SECONDS, _list_functions)
         function_count = len(functions)
-        total_invocations = 0
-        total_errors = 0
-        total_throttles = 0
-        total_duration = 0
-        duration_count = 0
         
-        for func in functions[:30]:  # Limit for performance
-            function_name = func['FunctionName']
-            try:
-                # Invocations
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/Lambda',
-                    metric_name='Invocations',
-                    dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                total_invocations += sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                
-                # Errors
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/Lambda',
-                    metric_name='Errors',
-                    dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                total_errors += sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                
-                # Throttles
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/Lambda',
-                    metric_name='Throttles',
-                    dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum']
-                )
-                total_throttles += sum(dp.get('Sum', 0) for dp in result.get('datapoints', []))
-                
-                # Duration
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/Lambda',
-                    metric_name='Duration',
-                    dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Average']
-                )
-                for dp in result.get('datapoints', []):
-                    total_duration += dp.get('Average', 0)
-                    duration_count += 1
-            except Exception as e:
-                logger.warning(f"Error getting Lambda metrics for {function_name}: {e}")
+        # One SEARCH per metric aggregates every function server-side
+        values, partial = _get_search_totals(
+            cw_helper, 'AWS/Lambda', 'FunctionName', LAMBDA_SUMMARY_METRICS,
+            start_time, end_time, period, function_count
+        )
+        
+        total_invocations = sum(values['Invocations'])
+        total_errors = sum(values['Errors'])
+        total_throttles = sum(values['Throttles'])
+        total_duration = sum(values['Duration'])
+        duration_count = len(values['Duration'])
         
         error_rate = (total_errors / total_invocations * 100) if total_invocations > 0 else 0
         avg_duration = (total_duration / duration_count) if duration_count > 0 else 0
@@ -227,6 +286,7 @@ def get_lambda_summary(cw_helper: CloudWatchHelper, start_time: datetime, end_ti
             'total_throttles': int(total_throttles),
             'error_rate_percent': round(error_rate, 2),
             'avg_duration_ms': round(avg_duration, 2),
+            'partial_data': partial,
             'status': 'healthy' if error_rate < 1 and total_throttles == 0 else 'warning'
         }
     except Exception as e:
@@ -248,37 +308,40 @@ def generate_report(hours: int = 24, services: Optional[List[str]] = None) -> Di
     if services is None:
         services = ['s3', 'dynamodb', 'lambda']
     
-    cw_helper = CloudWatchHelper()
-    start_time, end_time = parse_time_range(hours)
+    cw_helper = _CW_HELPER
     period = calculate_period(hours)
+    start_time, end_time = parse_time_range(hours, TIME_RANGE_WINDOW_SECONDS)
     
     report = {
         'report_generated_at': datetime.utcnow().isoformat(),
         'time_range': {
-            'start': start_time.isoformat(),
-            'end': end_time.isoformat(),
+            'start': start_time,
+            'end': end_time,
             'hours': hours
         },
         'services': {},
         'overall_status': 'healthy'
     }
     
-    statuses = []
-    
-    if 's3' in services:
-        logger.info("Getting S3 summary...")
-        report['services']['s3'] = get_s3_summary(cw_helper, start_time, end_time)
-        statuses.append(report['services']['s3'].get('status', 'unknown'))
-    
-    if 'dynamodb' in services:
-        logger.info("Getting DynamoDB summary...")
-        report['services']['dynamodb'] = get_dynamodb_summary(cw_helper, start_time, end_time, period)
-        statuses.append(report['services']['dynamodb'].get('status', 'unknown'))
+    # The service summaries are independent, so fetch them concurrently
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        if 's3' in services:
+            logger.info("Getting S3 summary...")
+            jobs['s3'] = executor.submit(get_s3_summary, cw_helper, start_time, end_time)
+        
+        if 'dynamodb' in services:
+            logger.info("Getting DynamoDB summary...")
+            jobs['dynamodb'] = executor.submit(get_dynamodb_summary, cw_helper, start_time, end_time, period)
+        
+        if 'lambda' in services:
+            logger.info("Getting Lambda summary...")
+            jobs['lambda'] = executor.submit(get_lambda_summary, cw_helper, start_time, end_time, period)
     
-    if 'lambda' in services:
-        logger.info("Getting Lambda summary...")
-        report['services']['lambda'] = get_lambda_summary(cw_helper, start_time, end_time, period)
-        statuses.append(report['services']['lambda'].get('status', 'unknown'))
+    statuses = []
+    for service, future in jobs.items():
+        report['services'][service] = future.result()
+        statuses.append(report['services'][service].get('status', 'unknown'))
     
     # Determine overall status
     if 'error' in statuses:
@@ -294,48 +357,54 @@ def generate_report(hours: int = 24, services: Optional[List[str]] = None) -> Di
     return report
 
 
+def _s3_recommendations(s3: Dict[str, Any]) -> List[str]:
+    """Recommendations for a healthy S3 summary"""
+    recommendations = []
+    if s3.get('total_size_gb', 0) > 100:
+        recommendations.append(S3_LIFECYCLE_MSG)
+    return recommendations
+
+
+def _dynamodb_recommendations(ddb: Dict[str, Any]) -> List[str]:
+    """Recommendations for a healthy DynamoDB summary"""
+    recommendations = []
+    if ddb.get('total_throttle_events', 0) > 0:
+        recommendations.append(DDB_THROTTLE_TMPL.format(n=ddb['total_throttle_events']))
+    return recommendations
+
+
+def _lambda_recommendations(lam: Dict[str, Any]) -> List[str]:
+    """Recommendations for a healthy Lambda summary"""
+    recommendations = []
+    if lam.get('error_rate_percent', 0) > 1:
+        recommendations.append(LAMBDA_ERROR_RATE_TMPL.format(rate=lam['error_rate_percent']))
+    if lam.get('total_throttles', 0) > 0:
+        recommendations.append(LAMBDA_THROTTLE_TMPL.format(n=lam['total_throttles']))
+    if lam.get('avg_duration_ms', 0) > 10000:
+        recommendations.append(LAMBDA_DURATION_TMPL.format(ms=lam['avg_duration_ms']))
+    return recommendations
+
+
+# Recommendation rules per service, applied in this order
+_RECO_RULES = {
+    's3': _s3_recommendations,
+    'dynamodb': _dynamodb_recommendations,
+    'lambda': _lambda_recommendations
+}
+
+
 def generate_recommendations(services: Dict[str, Any]) -> List[str]:
     """Generate recommendations based on metrics"""
     recommendations = []
     
-    # S3 recommendations
-    if 's3' in services and 'error' not in services['s3']:
-        s3 = services['s3']
-        if s3.get('total_size_gb', 0) > 100:
-            recommendations.append(
-                "Consider implementing S3 Lifecycle policies to manage storage costs for large buckets."
-            )
-    
-    # DynamoDB recommendations
-    if 'dynamodb' in services and 'error' not in services['dynamodb']:
-        ddb = services['dynamodb']
-        if ddb.get('total_throttle_events', 0) > 0:
-            recommendations.append(
-                f"DynamoDB throttling detected ({ddb['total_throttle_events']} events). "
-                "Consider increasing provisioned capacity or switching to on-demand mode."
-            )
-    
-    # Lambda recommendations
-    if 'lambda' in services and 'error' not in services['lambda']:
-        lam = services['lambda']
-        if lam.get('error_rate_percent', 0) > 1:
-            recommendations.append(
-                f"Lambda error rate is {lam['error_rate_percent']}%. "
-                "Review CloudWatch logs to identify and fix recurring errors."
-            )
-        if lam.get('total_throttles', 0) > 0:
-            recommendations.append(
-                f"Lambda throttling detected ({lam['total_throttles']} events). "
-                "Consider requesting a concurrency limit increase."
-            )
-        if lam.get('avg_duration_ms', 0) > 10000:
-            recommendations.append(
-                f"Average Lambda duration is high ({lam['avg_duration_ms']}ms). "
-                "Consider optimizing function code or increasing memory allocation."
-            )
+    # Only services whose summary succeeded are evaluated
+    for name, rules in _RECO_RULES.items():
+        data = services.get(name)
+        if data is not None and 'error' not in data:
+            recommendations.extend(rules(data))
     
     if not recommendations:
-        recommendations.append("All services are operating within normal parameters.")
+        recommendations.append(ALL_NORMAL_MSG)
     
     return recommendations
 
@@ -358,7 +427,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         # Parse parameters
         if http_method == 'POST':
-            body = json.loads(event.get('body', '{}')) if event.get('body') else {}
+            body = loads(event['body']) if event.get('body') else {}
             hours = body.get('hours', 24)
             services = body.get('services')
         else:
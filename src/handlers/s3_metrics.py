@@ -6,22 +6,39 @@ Retrieves CloudWatch metrics for S3 buckets
 import boto3
 import logging
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 
-from utils.cloudwatch_helper import CloudWatchHelper, parse_time_range, calculate_period
+from utils.cloudwatch_helper import CLIENT_CONFIG, CloudWatchHelper, parse_time_range, calculate_period, LAYOUTS, to_columnar_metrics
 from utils.response_helper import success_response, error_response, not_found_response
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
+# Clients are created once per container and reused across invocations
+_SESSION = boto3.session.Session()
+_S3 = _SESSION.client('s3', config=CLIENT_CONFIG)
+_CW_HELPER = CloudWatchHelper()
+
 # S3 metrics to retrieve
 S3_METRICS = [
     'BucketSizeBytes',
     'NumberOfObjects'
 ]
 
+# Storage types queried for storage metrics; object counts are only
+# published for AllStorageTypes
+STORAGE_TYPES = ['StandardStorage', 'StandardIAStorage', 'GlacierStorage', 'AllStorageTypes']
+
+# Storage metrics are published once a day, so never query a shorter window
+STORAGE_METRICS_MIN_HOURS = 48
+
+# (metric, storage type) pairs each bucket publishes; changes rarely
+STORAGE_METRICS_CACHE_TTL_SECONDS = 3600
+_STORAGE_METRICS_CACHE = {'value': None, 'expires': 0}
+
 # S3 Request metrics (requires request metrics to be enabled on bucket)
 S3_REQUEST_METRICS = [
     'AllRequests',
@@ -34,14 +51,159 @@ S3_REQUEST_METRICS = [
     'TotalRequestLatency'
 ]
 
+# Statistics requested for storage metrics in single-bucket results
+STORAGE_METRIC_STATS = ['Average', 'Maximum']
+
+# Statistics requested per request metric; counters only need Sum
+REQUEST_METRIC_STATS = {
+    'FirstByteLatency': ['Average', 'Maximum'],
+    'TotalRequestLatency': ['Average', 'Maximum']
+}
+
+# Bucket listings change slowly; reuse them across warm invocations
+BUCKET_CACHE_TTL_SECONDS = 300
+_BUCKET_CACHE = {'value': None, 'expires': 0}
+
+# Metric time ranges are aligned to this window; results are reused within it
+METRICS_CACHE_WINDOW_SECONDS = 300
+_METRICS_CACHE = {'end_time': None, 'entries': {}}
+
+# Storage metrics only change daily, so the all-buckets summary is kept longer
+SUMMARY_CACHE_WINDOW_SECONDS = 3600
+_SUMMARY_CACHE = {'end_time': None, 'entries': {}}
+
 
 def get_all_buckets() -> List[str]:
     """Get list of all S3 buckets"""
-    s3_client = boto3.client('s3')
-    response = s3_client.list_buckets()
+    response = _S3.list_buckets()
     return [bucket['Name'] for bucket in response.get('Buckets', [])]
 
 
+def get_all_buckets_cached(ttl: int = BUCKET_CACHE_TTL_SECONDS, refresh: bool = False) -> List[str]:
+    """Get list of all S3 buckets, reusing the last result for up to ttl seconds unless refresh is set"""
+    now = time.monotonic()
+    if not refresh and now < _BUCKET_CACHE['expires']:
+        return _BUCKET_CACHE['value']
+    
+    buckets = get_all_buckets()
+    _BUCKET_CACHE.update(value=buckets, expires=now + ttl)
+    return buckets
+
+
+def _get_cached_metrics(cache: Dict[str, Any], key: tuple, end_time: datetime) -> Optional[Dict[str, Any]]:
+    """Return metrics cached under key for the window ending at end_time"""
+    if cache['end_time'] != end_time:
+        return None
+    return cache['entries'].get(key)
+
+
+def _put_cached_metrics(cache: Dict[str, Any], key: tuple, end_time: datetime, value: Dict[str, Any]) -> None:
+    """Cache metrics for the window ending at end_time, dropping older windows"""
+    if cache['end_time'] != end_time:
+        cache.update(end_time=end_time, entries={})
+    cache['entries'][key] = value
+
+
+def _group_storage_metrics(metrics: Iterable[Dict[str, Any]]) -> Dict[str, List[Tuple[str, str]]]:
+    """Group listed S3 metrics into (metric, storage type) pairs per bucket"""
+    storage_metrics = {}
+    for metric in metrics:
+        if metric['metric_name'] not in S3_METRICS:
+            continue
+        dimensions = {d['Name']: d['Value'] for d in metric['dimensions']}
+        storage_type = dimensions.get('StorageType')
+        if storage_type in STORAGE_TYPES:
+            storage_metrics.setdefault(dimensions.get('BucketName'), []).append(
+                (metric['metric_name'], storage_type)
+            )
+    return storage_metrics
+
+
+def get_storage_metrics_by_bucket(
+    cw_helper: CloudWatchHelper,
+    ttl: int = STORAGE_METRICS_CACHE_TTL_SECONDS
+) -> Dict[str, List[Tuple[str, str]]]:
+    """Map each bucket to the (metric, storage type) pairs it has published"""
+    now = time.monotonic()
+    if now < _STORAGE_METRICS_CACHE['expires']:
+        return _STORAGE_METRICS_CACHE['value']
+    
+    # One paginated listing per storage metric covers every bucket
+    storage_metrics = _group_storage_metrics(
+        metric
+        for metric_name in S3_METRICS
+        for metric in cw_helper.iter_metrics('AWS/S3', metric_name=metric_name)
+    )
+    
+    _STORAGE_METRICS_CACHE.update(value=storage_metrics, expires=now + ttl)
+    return storage_metrics
+
+
+def discover_storage_metrics(
+    cw_helper: CloudWatchHelper,
+    bucket_name: Optional[str] = None
+) -> Optional[Dict[str, List[Tuple[str, str]]]]:
+    """
+    Map buckets to their published storage metrics, or None if the listing fails
+    
+    Args:
+        cw_helper: CloudWatch helper used for the listing
+        bucket_name: Only list this bucket's metrics instead of every bucket's
+    
+    Returns:
+        Dictionary mapping bucket name to (metric, storage type) pairs, or None
+    """
+    try:
+        if bucket_name is not None:
+            return _group_storage_metrics(cw_helper.list_metrics(
+                'AWS/S3',
+                dimensions=[{'Name': 'BucketName', 'Value': bucket_name}]
+            ))
+        return get_storage_metrics_by_bucket(cw_helper)
+    except Exception as e:
+        logger.warning(f"Could not list storage metrics: {str(e)}")
+        return None
+
+
+def get_bucket_storage_metrics(
+    storage_metrics_by_bucket: Optional[Dict[str, List[Tuple[str, str]]]],
+    bucket_name: str
+) -> List[Tuple[str, str]]:
+    """Get the (metric, storage type) pairs worth querying for a bucket"""
+    if storage_metrics_by_bucket is None:
+        # Without a listing, query every combination
+        return [
+            (metric_name, storage_type)
+            for storage_type in STORAGE_TYPES
+            for metric_name in S3_METRICS
+        ]
+    return storage_metrics_by_bucket.get(bucket_name, [])
+
+
+def get_storage_metric_requests(
+    bucket_name: str,
+    statistics: List[str],
+    storage_metrics: List[Tuple[str, str]]
+) -> Dict[str, Dict[str, Any]]:
+    """Build storage metric requests for a bucket, keyed by '<metric>_<storage type>'"""
+    metric_requests = {}
+    
+    # S3 storage metrics require specific storage type dimension
+    for metric_name, storage_type in storage_metrics:
+        metric_requests[f"{metric_name}_{storage_type}"] = {
+            'namespace': 'AWS/S3',
+            'metric_name': metric_name,
+            'dimensions': [
+                {'Name': 'BucketName', 'Value': bucket_name},
+                {'Name': 'StorageType', 'Value': storage_type}
+            ],
+            'statistics': statistics,
+            'period': 86400  # S3 storage metrics are daily
+        }
+    
+    return metric_requests
+
+
 def get_bucket_metrics(
     bucket_name: str,
     hours: int = 24,
@@ -58,69 +220,72 @@ def get_bucket_metrics(
     Returns:
         Dictionary containing bucket metrics
     """
-    cw_helper = CloudWatchHelper()
-    start_time, end_time = parse_time_range(hours)
+    start_time, end_time = parse_time_range(hours, window=METRICS_CACHE_WINDOW_SECONDS)
+    
+    cache_key = (bucket_name, hours, include_request_metrics)
+    cached = _get_cached_metrics(_METRICS_CACHE, cache_key, end_time)
+    if cached is not None:
+        return cached
+    
+    cw_helper = _CW_HELPER
     period = calculate_period(hours)
     
     metrics_data = {
         'bucket_name': bucket_name,
         'metrics': {},
         'time_range': {
-            'start': start_time.isoformat(),
-            'end': end_time.isoformat(),
+            'start': start_time,
+            'end': end_time,
             'hours': hours
         }
     }
     
-    # Get storage metrics (daily metrics for S3)
-    for metric_name in S3_METRICS:
-        try:
-            # S3 storage metrics require specific storage type dimension
-            for storage_type in ['StandardStorage', 'StandardIAStorage', 'GlacierStorage']:
-                dimensions = [
-                    {'Name': 'BucketName', 'Value': bucket_name},
-                    {'Name': 'StorageType', 'Value': storage_type}
-                ]
-                
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/S3',
-                    metric_name=metric_name,
-                    dimensions=dimensions,
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=86400,  # S3 storage metrics are daily
-                    statistics=['Average', 'Maximum']
-                )
-                
-                if result['datapoints']:
-                    key = f"{metric_name}_{storage_type}"
-                    metrics_data['metrics'][key] = result
-        except Exception as e:
-            logger.warning(f"Could not get {metric_name} for {bucket_name}: {str(e)}")
+    # Only query storage metrics the bucket actually has, over at least two days
+    storage_requests = get_storage_metric_requests(
+        bucket_name,
+        STORAGE_METRIC_STATS,
+        get_bucket_storage_metrics(discover_storage_metrics(cw_helper, bucket_name), bucket_name)
+    )
+    storage_start = end_time - timedelta(hours=max(hours, STORAGE_METRICS_MIN_HOURS))
     
     # Get request metrics if enabled
+    request_requests = {}
     if include_request_metrics:
+        dimensions = [
+            {'Name': 'BucketName', 'Value': bucket_name},
+            {'Name': 'FilterId', 'Value': 'EntireBucket'}
+        ]
         for metric_name in S3_REQUEST_METRICS:
-            try:
-                dimensions = [
-                    {'Name': 'BucketName', 'Value': bucket_name},
-                    {'Name': 'FilterId', 'Value': 'EntireBucket'}
-                ]
-                
-                result = cw_helper.get_metric_statistics(
-                    namespace='AWS/S3',
-                    metric_name=metric_name,
-                    dimensions=dimensions,
-                    start_time=start_time,
-                    end_time=end_time,
-                    period=period,
-                    statistics=['Sum', 'Average', 'Maximum']
-                )
-                
-                if result['datapoints']:
-                    metrics_data['metrics'][metric_name] = result
-            except Exception as e:
-                logger.warning(f"Could not get request metric {metric_name}: {str(e)}")
+            request_requests[metric_name] = {
+                'namespace': 'AWS/S3',
+                'metric_name': metric_name,
+                'dimensions': dimensions,
+                'statistics': REQUEST_METRIC_STATS.get(metric_name, ['Sum'])
+            }
+    
+    try:
+        results = {}
+        if storage_requests:
+            results.update(cw_helper.get_metric_statistics_batch(
+                storage_requests,
+                start_time=storage_start,
+                end_time=end_time,
+                period=period
+            ))
+        if request_requests:
+            results.update(cw_helper.get_metric_statistics_batch(
+                request_requests,
+                start_time=start_time,
+                end_time=end_time,
+                period=period
+            ))
+        
+        for key, result in results.items():
+            if result['datapoints']:
+                metrics_data['metrics'][key] = result
+        _put_cached_metrics(_METRICS_CACHE, cache_key, end_time, metrics_data)
+    except Exception as e:
+        logger.warning(f"Could not get metrics for {bucket_name}: {str(e)}")
     
     return metrics_data
 
@@ -135,7 +300,13 @@ def get_all_buckets_summary(hours: int = 24) -> Dict[str, Any]:
     Returns:
         Dictionary containing summary for all buckets
     """
-    buckets = get_all_buckets()
+    start_time, end_time = parse_time_range(hours, window=SUMMARY_CACHE_WINDOW_SECONDS)
+    cache_key = (hours,)
+    cached = _get_cached_metrics(_SUMMARY_CACHE, cache_key, end_time)
+    if cached is not None:
+        return cached
+    
+    buckets = get_all_buckets_cached()
     
     summary = {
         'total_buckets': len(buckets),
@@ -147,36 +318,55 @@ def get_all_buckets_summary(hours: int = 24) -> Dict[str, Any]:
         'time_range_hours': hours
     }
     
+    cw_helper = _CW_HELPER
+    
+    # Build one batched request covering every bucket's storage metrics,
+    # discovering them once rather than retrying a failed listing per bucket
+    storage_metrics_by_bucket = discover_storage_metrics(cw_helper)
+    metric_requests = {}
     for bucket_name in buckets:
-        try:
-            bucket_info = {
-                'name': bucket_name,
-                'size_bytes': 0,
-                'number_of_objects': 0
-            }
-            
-            metrics = get_bucket_metrics(bucket_name, hours)
-            
-            # Extract latest values
-            for key, data in metrics.get('metrics', {}).items():
-                if 'BucketSizeBytes' in key and data.get('datapoints'):
-                    latest = data['datapoints'][-1] if data['datapoints'] else {}
-                    size = latest.get('Average', 0)
-                    bucket_info['size_bytes'] += size
-                    summary['aggregated']['total_size_bytes'] += size
-                elif 'NumberOfObjects' in key and data.get('datapoints'):
-                    latest = data['datapoints'][-1] if data['datapoints'] else {}
-                    count = latest.get('Average', 0)
-                    bucket_info['number_of_objects'] += count
-                    summary['aggregated']['total_objects'] += count
-            
-            summary['buckets'].append(bucket_info)
-        except Exception as e:
-            logger.warning(f"Could not get metrics for bucket {bucket_name}: {str(e)}")
-            summary['buckets'].append({
-                'name': bucket_name,
-                'error': str(e)
-            })
+        storage_metrics = get_bucket_storage_metrics(storage_metrics_by_bucket, bucket_name)
+        for key, request in get_storage_metric_requests(bucket_name, ['Average'], storage_metrics).items():
+            metric_requests[(bucket_name, key)] = request
+    
+    # Storage metrics are daily; widen short windows so the latest point lands
+    storage_start = end_time - timedelta(hours=max(hours, STORAGE_METRICS_MIN_HOURS))
+    try:
+        results = cw_helper.get_metric_statistics_batch(
+            metric_requests,
+            start_time=storage_start,
+            end_time=end_time
+        )
+    except Exception as e:
+        logger.warning(f"Could not get metrics for buckets: {str(e)}")
+        summary['buckets'] = [{'name': bucket_name, 'error': str(e)} for bucket_name in buckets]
+        return summary
+    
+    bucket_infos = {
+        bucket_name: {
+            'name': bucket_name,
+            'size_bytes': 0,
+            'number_of_objects': 0
+        }
+        for bucket_name in buckets
+    }
+    
+    # Extract latest values
+    for (bucket_name, key), data in results.items():
+        if not data['datapoints']:
+            continue
+        
+        bucket_info = bucket_infos[bucket_name]
+        latest = data['datapoints'][-1].get('Average', 0)
+        if key.startswith('BucketSizeBytes'):
+            bucket_info['size_bytes'] += latest
+            summary['aggregated']['total_size_bytes'] += latest
+        elif key.startswith('NumberOfObjects'):
+            bucket_info['number_of_objects'] += latest
+            summary['aggregated']['total_objects'] += latest
+    
+    summary['buckets'] = list(bucket_infos.values())
+    _put_cached_metrics(_SUMMARY_CACHE, cache_key, end_time, summary)
     
     return summary
 
@@ -202,6 +392,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         # Parse query parameters
         query_params = event.get('queryStringParameters') or {}
         hours = int(query_params.get('hours', 24))
+        layout = query_params.get('layout', 'rows')
         include_request_metrics = query_params.get('include_request_metrics', 'false').lower() == 'true'
         
         # Validate hours parameter
@@ -211,12 +402,21 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 status_code=400
             )
         
+        # Validate layout parameter
+        if layout not in LAYOUTS:
+            return error_response(
+                message="Layout parameter must be 'rows' or 'columnar'",
+                status_code=400
+            )
+        
         if bucket_name:
             # Get metrics for specific bucket
             logger.info(f"Getting metrics for bucket: {bucket_name}")
             
-            # Verify bucket exists
-            buckets = get_all_buckets()
+            # Verify bucket exists; refresh the listing before reporting a miss
+            buckets = get_all_buckets_cached()
+            if bucket_name not in buckets:
+                buckets = get_all_buckets_cached(refresh=True)
             if bucket_name not in buckets:
                 return not_found_response(f"Bucket '{bucket_name}'")
             
@@ -226,6 +426,9 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 include_request_metrics=include_request_metrics
             )
             
+            if layout == 'columnar':
+                metrics = to_columnar_metrics(metrics)
+            
             return success_response(
                 data=metrics,
                 message=f"S3 metrics for bucket '{bucket_name}'"
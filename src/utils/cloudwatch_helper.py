@@ -4,18 +4,131 @@ Common utilities for fetching CloudWatch metrics
 """
 
 import boto3
+from bisect import bisect_left
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Iterator, List, Any, Optional
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Datapoint layouts accepted by the per-resource endpoints
+LAYOUTS = ('rows', 'columnar')
+
+# GetMetricData accepts at most 500 queries per request
+MAX_METRIC_DATA_QUERIES = 500
+
+# A SEARCH expression matches at most 500 time series; aggregates over more
+# resources than that leave the rest out
+MAX_SEARCH_SERIES = 500
+
+# Maximum number of CloudWatch calls made concurrently
+CW_CONCURRENCY = int(os.environ.get('CW_CONCURRENCY', '16'))
+
+# Shared worker pool for concurrent CloudWatch calls, reused across warm
+# invocations instead of spawning threads per call
+_EXECUTOR = ThreadPoolExecutor(max_workers=CW_CONCURRENCY)
+
+# Attempts per AWS call (including the first) before throttling errors surface
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '10'))
+
+# Shared client config: connection pool sized for concurrent calls, adaptive
+# retries (exponential backoff with jitter plus client-side rate limiting)
+# for throttling and TCP keep-alive for reused connections
+CLIENT_CONFIG = Config(
+    max_pool_connections=max(32, CW_CONCURRENCY),
+    retries={'mode': 'adaptive', 'max_attempts': AWS_MAX_ATTEMPTS},
+    tcp_keepalive=True
+)
+
+DEFAULT_STATISTICS = ['Average', 'Sum', 'Maximum', 'Minimum']
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Query end times are aligned to this window so repeated requests share a
+# range; only the newest few minutes, which CloudWatch is still filling, are left out
+TIME_RANGE_WINDOW_SECONDS = 300
+
+# Period for time ranges up to each bound: <=3h 1 minute, <=24h 5 minutes,
+# <=7 days 1 hour, longer 1 day
+_PERIOD_BOUNDS_HOURS = (3, 24, 168)
+_PERIODS = (60, 300, 3600, 86400)
+
+# In-process cache for repeated ListMetrics / GetMetricStatistics calls and
+# GetMetricData batches, kept at module scope so it survives warm invocations
+CACHE_MAX_ENTRIES = 256
+LIST_METRICS_CACHE_TTL_SECONDS = 300
+_CACHE: Dict[tuple, tuple] = {}
+# Pool threads read and write the cache concurrently
+_CACHE_LOCK = threading.Lock()
+
+
+def _cache_get(key: tuple) -> Any:
+    """Return the cached value for key, or None if missing or expired"""
+    with _CACHE_LOCK:
+        entry = _CACHE.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[0]:
+            _CACHE.pop(key, None)
+            return None
+        return entry[1]
+
+
+def _cache_put(key: tuple, value: Any, ttl: int) -> None:
+    """Cache value under key for ttl seconds, evicting when the cache is full"""
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        if len(_CACHE) >= CACHE_MAX_ENTRIES:
+            for stale_key in [k for k, (expires, _) in _CACHE.items() if now >= expires]:
+                _CACHE.pop(stale_key, None)
+            # Still full: drop the oldest entry
+            if len(_CACHE) >= CACHE_MAX_ENTRIES:
+                _CACHE.pop(next(iter(_CACHE)), None)
+        _CACHE[key] = (now + ttl, value)
+
+
+def _align_range(start_time: datetime, end_time: datetime, period: int) -> tuple:
+    """
+    Widen a time range outward to period boundaries
+    
+    The start is rounded down and the end up, so the aligned range always
+    covers the requested one. Ranges no longer than one period are returned
+    unchanged: CloudWatch aggregates them into a single datapoint, and
+    aligning would move that window away from the one requested.
+    """
+    if (end_time - start_time).total_seconds() <= period:
+        return start_time, end_time
+    aligned_start = align_to_period(start_time, period)
+    aligned_end = align_to_period(end_time, period)
+    if aligned_end < end_time:
+        aligned_end += timedelta(seconds=period)
+    return aligned_start, aligned_end
+
+
+def _dimensions_key(dimensions: Optional[List[Dict[str, str]]]) -> tuple:
+    """Hashable, order-independent form of a dimensions list"""
+    return tuple(sorted((d['Name'], d['Value']) for d in dimensions or []))
+
+
+@lru_cache(maxsize=8)
+def _cloudwatch_client(region: Optional[str] = None) -> Any:
+    """Get the shared CloudWatch client for a region, creating it on first use"""
+    session = boto3.session.Session()
+    return session.client('cloudwatch', region_name=region, config=CLIENT_CONFIG)
+
 
 class CloudWatchHelper:
     """Helper class for CloudWatch metric operations"""
     
     def __init__(self, region: Optional[str] = None):
-        self.cloudwatch = boto3.client('cloudwatch', region_name=region)
+        self.cloudwatch = _cloudwatch_client(region)
     
     def get_metric_statistics(
         self,
@@ -42,12 +155,14 @@ class CloudWatchHelper:
         Returns:
             Dictionary containing metric data points
         """
-        if end_time is None:
-            end_time = datetime.utcnow()
-        if start_time is None:
-            start_time = end_time - timedelta(hours=24)
-        if statistics is None:
-            statistics = ['Average', 'Sum', 'Maximum', 'Minimum']
+        cache_key, start_time, end_time, statistics = self._statistics_request(
+            namespace, metric_name, dimensions, start_time, end_time, period, statistics
+        )
+        
+        # Results are reused for half a period; callers align their ranges
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
         
         try:
             response = self.cloudwatch.get_metric_statistics(
@@ -63,26 +178,82 @@ class CloudWatchHelper:
             # Sort datapoints by timestamp
             datapoints = sorted(
                 response.get('Datapoints', []),
-                key=lambda x: x['Timestamp']
+                key=itemgetter('Timestamp')
             )
             
-            # Convert timestamps to ISO format strings
-            for dp in datapoints:
-                dp['Timestamp'] = dp['Timestamp'].isoformat()
-            
-            return {
+            result = {
                 'metric_name': metric_name,
                 'namespace': namespace,
                 'dimensions': dimensions,
                 'datapoints': datapoints,
                 'period': period,
-                'start_time': start_time.isoformat(),
-                'end_time': end_time.isoformat()
+                'start_time': start_time,
+                'end_time': end_time
             }
+            _cache_put(cache_key, result, max(period // 2, 1))
+            return result
         except Exception as e:
             logger.error(f"Error fetching metric {metric_name}: {str(e)}")
             raise
     
+    def get_metric_statistics_many(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Get metric statistics for several metrics concurrently
+        
+        Duplicate requests in the batch are fetched once and share the result.
+        
+        Args:
+            requests: List of get_metric_statistics keyword arguments
+        
+        Returns:
+            List of metric results, in the same order as requests
+        """
+        # Identical requests (same metric, dimensions, period and aligned
+        # window) share one in-flight call instead of each hitting CloudWatch
+        in_flight = {}
+        futures = []
+        for request in requests:
+            cache_key, start_time, end_time, _ = self._statistics_request(**request)
+            future = in_flight.get(cache_key)
+            if future is None:
+                future = in_flight[cache_key] = _EXECUTOR.submit(
+                    self.get_metric_statistics,
+                    **{**request, 'start_time': start_time, 'end_time': end_time}
+                )
+            futures.append(future)
+        return [future.result() for future in futures]
+    
+    def _statistics_request(
+        self,
+        namespace: str,
+        metric_name: str,
+        dimensions: List[Dict[str, str]],
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        period: int = 3600,
+        statistics: Optional[List[str]] = None
+    ) -> tuple:
+        """
+        Apply get_metric_statistics defaults and period alignment
+        
+        Returns:
+            Tuple of (cache key, start time, end time, statistics)
+        """
+        if end_time is None:
+            end_time = datetime.utcnow()
+        if start_time is None:
+            start_time = end_time - timedelta(hours=24)
+        if statistics is None:
+            statistics = DEFAULT_STATISTICS
+        # CloudWatch performs best with ranges aligned to the period
+        start_time, end_time = _align_range(start_time, end_time, period)
+        
+        cache_key = (
+            'statistics', self.cloudwatch.meta.region_name, namespace, metric_name,
+            _dimensions_key(dimensions), period, start_time, end_time, tuple(statistics)
+        )
+        return cache_key, start_time, end_time, statistics
+    
     def get_metric_data(
         self,
         metric_queries: List[Dict[str, Any]],
@@ -92,6 +263,9 @@ class CloudWatchHelper:
         """
         Get metric data using GetMetricData API for multiple metrics
         
+        Queries are sent in batches of up to 500, fetched concurrently, and each
+        batch is paged via NextToken; results for the same query Id are merged.
+        
         Args:
             metric_queries: List of metric data queries
             start_time: Start time for metrics
@@ -105,50 +279,190 @@ class CloudWatchHelper:
         if start_time is None:
             start_time = end_time - timedelta(hours=24)
         
+        # Align to the finest period requested so no query loses datapoints
+        periods = [query['MetricStat']['Period'] for query in metric_queries if 'MetricStat' in query]
+        if periods:
+            start_time, end_time = _align_range(start_time, end_time, min(periods))
+        
+        results = {}
+        
+        batches = [
+            metric_queries[i:i + MAX_METRIC_DATA_QUERIES]
+            for i in range(0, len(metric_queries), MAX_METRIC_DATA_QUERIES)
+        ]
+        
         try:
-            response = self.cloudwatch.get_metric_data(
-                MetricDataQueries=metric_queries,
-                StartTime=start_time,
-                EndTime=end_time
-            )
+            if len(batches) > 1:
+                batch_results = list(_EXECUTOR.map(
+                    lambda batch: self._fetch_metric_data_batch(batch, start_time, end_time),
+                    batches
+                ))
+            else:
+                batch_results = [
+                    self._fetch_metric_data_batch(batch, start_time, end_time)
+                    for batch in batches
+                ]
             
-            results = []
-            for result in response.get('MetricDataResults', []):
-                # Convert timestamps to ISO format
-                timestamps = [ts.isoformat() for ts in result.get('Timestamps', [])]
-                results.append({
-                    'id': result['Id'],
-                    'label': result.get('Label', ''),
-                    'timestamps': timestamps,
-                    'values': result.get('Values', []),
-                    'status_code': result.get('StatusCode', '')
-                })
+            for raw_results in batch_results:
+                for result in raw_results:
+                    # Series split across pages share the same Id
+                    entry = results.get(result['Id'])
+                    if entry is None:
+                        entry = results[result['Id']] = {
+                            'id': result['Id'],
+                            'label': result.get('Label', ''),
+                            'timestamps': [],
+                            'values': [],
+                            'status_code': '',
+                            'messages': []
+                        }
+                    
+                    # Timestamps stay datetimes; the response serializer formats them
+                    entry['timestamps'].extend(result.get('Timestamps', []))
+                    entry['values'].extend(result.get('Values', []))
+                    entry['status_code'] = result.get('StatusCode', '')
+                    entry['messages'].extend(result.get('Messages', []))
             
             return {
-                'results': results,
-                'start_time': start_time.isoformat(),
-                'end_time': end_time.isoformat()
+                'results': list(results.values()),
+                'start_time': start_time,
+                'end_time': end_time
             }
         except Exception as e:
             logger.error(f"Error fetching metric data: {str(e)}")
             raise
     
-    def list_metrics(
+    def _fetch_metric_data_batch(
+        self,
+        metric_queries: List[Dict[str, Any]],
+        start_time: datetime,
+        end_time: datetime
+    ) -> List[Dict[str, Any]]:
+        """Fetch every page of a single GetMetricData batch"""
+        paginator = self.cloudwatch.get_paginator('get_metric_data')
+        results = []
+        
+        for page in paginator.paginate(
+            MetricDataQueries=metric_queries,
+            StartTime=start_time,
+            EndTime=end_time,
+            ScanBy='TimestampAscending'
+        ):
+            results.extend(page.get('MetricDataResults', []))
+        
+        return results
+    
+    def get_metric_statistics_batch(
+        self,
+        metric_requests: Dict[Any, Dict[str, Any]],
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        period: int = 3600
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Get statistics for many metrics using batched GetMetricData calls
+        
+        Each request is expanded into one query per statistic, and the results
+        are reshaped back into the get_metric_statistics return format. Results
+        are cached for half the finest period requested.
+        
+        Args:
+            metric_requests: Mapping of caller-defined keys to dictionaries with
+                'namespace', 'metric_name', 'dimensions' and optional
+                'statistics' and 'period' (overrides the default period)
+            start_time: Start time for metrics (default: 24 hours ago)
+            end_time: End time for metrics (default: now)
+            period: Default period in seconds (default: 3600 = 1 hour)
+        
+        Returns:
+            Dictionary mapping each request key to its metric data points
+        """
+        if end_time is None:
+            end_time = datetime.utcnow()
+        if start_time is None:
+            start_time = end_time - timedelta(hours=24)
+        
+        # Handlers repeat the same request set across warm invocations within
+        # a time window; reuse the result for half the finest period
+        cache_key = (
+            'batch', self.cloudwatch.meta.region_name, period, start_time, end_time,
+            tuple(
+                (
+                    key, request['namespace'], request['metric_name'],
+                    _dimensions_key(request['dimensions']), request.get('period', period),
+                    tuple(request.get('statistics') or DEFAULT_STATISTICS)
+                )
+                for key, request in metric_requests.items()
+            )
+        )
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        queries = []
+        query_targets = {}
+        
+        for key, request in metric_requests.items():
+            # The Metric payload is identical for every statistic of a request
+            metric = {
+                'Namespace': request['namespace'],
+                'MetricName': request['metric_name'],
+                'Dimensions': request['dimensions']
+            }
+            request_period = request.get('period', period)
+            for stat in request.get('statistics') or DEFAULT_STATISTICS:
+                query_id = f"m{len(queries)}"
+                query_targets[query_id] = (key, stat)
+                queries.append({
+                    'Id': query_id,
+                    'MetricStat': {'Metric': metric, 'Period': request_period, 'Stat': stat},
+                    'ReturnData': True
+                })
+        
+        points = {key: {} for key in metric_requests}
+        range_start, range_end = start_time, end_time
+        
+        if queries:
+            # get_metric_data reports the (aligned) range actually queried
+            response = self.get_metric_data(queries, start_time, end_time)
+            range_start, range_end = response['start_time'], response['end_time']
+            for result in response['results']:
+                key, stat = query_targets[result['id']]
+                for timestamp, value in zip(result['timestamps'], result['values']):
+                    points[key].setdefault(timestamp, {'Timestamp': timestamp})[stat] = value
+        
+        result = {
+            key: {
+                'metric_name': request['metric_name'],
+                'namespace': request['namespace'],
+                'dimensions': request['dimensions'],
+                'datapoints': [points[key][ts] for ts in sorted(points[key])],
+                'period': request.get('period', period),
+                'start_time': range_start,
+                'end_time': range_end
+            }
+            for key, request in metric_requests.items()
+        }
+        min_period = min((request.get('period', period) for request in metric_requests.values()), default=period)
+        _cache_put(cache_key, result, max(min_period // 2, 1))
+        return result
+    
+    def iter_metrics(
         self,
         namespace: str,
         metric_name: Optional[str] = None,
         dimensions: Optional[List[Dict[str, str]]] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> Iterator[Dict[str, Any]]:
         """
-        List available metrics in CloudWatch
+        Iterate over available metrics in CloudWatch, one page at a time
         
         Args:
             namespace: CloudWatch namespace
             metric_name: Optional metric name filter
             dimensions: Optional dimension filters
         
-        Returns:
-            List of available metrics
+        Yields:
+            Metric dictionaries
         """
         params = {'Namespace': namespace}
         
@@ -159,33 +473,221 @@ class CloudWatchHelper:
         
         try:
             paginator = self.cloudwatch.get_paginator('list_metrics')
-            metrics = []
-            
             for page in paginator.paginate(**params):
                 for metric in page.get('Metrics', []):
-                    metrics.append({
+                    yield {
                         'namespace': metric['Namespace'],
                         'metric_name': metric['MetricName'],
                         'dimensions': metric.get('Dimensions', [])
-                    })
-            
-            return metrics
+                    }
         except Exception as e:
             logger.error(f"Error listing metrics: {str(e)}")
             raise
+    
+    def list_metrics(
+        self,
+        namespace: str,
+        metric_name: Optional[str] = None,
+        dimensions: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        List available metrics in CloudWatch
+        
+        Args:
+            namespace: CloudWatch namespace
+            metric_name: Optional metric name filter
+            dimensions: Optional dimension filters
+        
+        Returns:
+            List of available metrics
+        """
+        cache_key = (
+            'list_metrics', self.cloudwatch.meta.region_name, namespace, metric_name,
+            _dimensions_key(dimensions)
+        )
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
+        metrics = list(self.iter_metrics(namespace, metric_name, dimensions))
+        _cache_put(cache_key, metrics, LIST_METRICS_CACHE_TTL_SECONDS)
+        return metrics
+    
+    def describe_metric(
+        self,
+        namespace: str,
+        metric_name: str,
+        dimensions: List[Dict[str, str]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a single fully specified metric without paginating
+        
+        Args:
+            namespace: CloudWatch namespace
+            metric_name: Name of the metric
+            dimensions: Complete list of the metric's dimensions
+        
+        Returns:
+            Metric dictionary, or None if CloudWatch has no such metric
+        """
+        try:
+            response = self.cloudwatch.list_metrics(
+                Namespace=namespace,
+                MetricName=metric_name,
+                Dimensions=dimensions
+            )
+        except Exception as e:
+            logger.error(f"Error describing metric {metric_name}: {str(e)}")
+            raise
+        
+        # Dimension filters also match metrics with extra dimensions
+        wanted = _dimensions_key(dimensions)
+        for metric in response.get('Metrics', []):
+            if _dimensions_key(metric.get('Dimensions')) == wanted:
+                return {
+                    'namespace': metric['Namespace'],
+                    'metric_name': metric['MetricName'],
+                    'dimensions': metric.get('Dimensions', [])
+                }
+        return None
+
+
+def build_search_queries(
+    query_id: str,
+    namespace: str,
+    dimension_name: str,
+    metric_name: str,
+    stat: str,
+    period: int,
+    aggregate: str = 'SUM'
+) -> List[Dict[str, Any]]:
+    """
+    Build GetMetricData queries aggregating a metric across all resources
+    
+    A SEARCH expression selects every series of the metric with exactly the
+    given dimension, and a math expression folds them into one series so
+    CloudWatch returns a single result instead of one per resource. SEARCH
+    matches at most MAX_SEARCH_SERIES series, so the aggregate undercounts
+    beyond that many resources.
+    
+    Args:
+        query_id: Id of the aggregated query (must start with a lowercase letter)
+        namespace: CloudWatch namespace
+        dimension_name: Dimension identifying a resource (e.g., 'FunctionName')
+        metric_name: Name of the metric
+        stat: Statistic to retrieve for each series (e.g., 'Sum', 'Average')
+        period: Period in seconds
+        aggregate: Metric math function applied across series (e.g., 'SUM', 'AVG')
+    
+    Returns:
+        List of MetricDataQuery dictionaries; only the aggregate returns data
+    """
+    search_id = f"{query_id}_search"
+    search = f"SEARCH('{{{namespace},{dimension_name}}} MetricName=\"{metric_name}\"', '{stat}', {period})"
+    return [
+        {'Id': search_id, 'Expression': search, 'ReturnData': False},
+        {'Id': query_id, 'Expression': f"{aggregate}({search_id})", 'ReturnData': True}
+    ]
+
+
+def reduce_datapoints(
+    datapoints: List[Dict[str, Any]],
+    statistic: str,
+    op: str = 'sum'
+) -> float:
+    """
+    Reduce one statistic across a list of datapoints
+    
+    Args:
+        datapoints: Datapoints as returned by get_metric_statistics
+        statistic: Statistic to reduce (e.g., 'Sum', 'Average', 'Maximum')
+        op: Reduction to apply ('sum', 'mean' or 'max')
+    
+    Returns:
+        Reduced value (0 when there are no datapoints)
+    """
+    values = [dp.get(statistic, 0) for dp in datapoints]
+    if not values:
+        return 0
+    
+    if op == 'sum':
+        return sum(values)
+    if op == 'mean':
+        return sum(values) / len(values)
+    if op == 'max':
+        return max(values)
+    raise ValueError(f"Unsupported reduction: {op}")
 
 
-def parse_time_range(hours: int = 24) -> tuple:
+def to_columnar(metric_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a metric result's datapoints into one list per field
+    
+    Row-shaped datapoints repeat every key per point; the columnar form
+    keeps each key once, e.g. {'Timestamp': [...], 'Sum': [...]}. Fields
+    missing from a datapoint are None in their column.
+    
+    Args:
+        metric_result: Metric result with a 'datapoints' list
+    
+    Returns:
+        New metric result with 'columns' in place of 'datapoints'
+    """
+    datapoints = metric_result.get('datapoints', [])
+    columns = {}
+    for i, dp in enumerate(datapoints):
+        for field, value in dp.items():
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = [None] * len(datapoints)
+            column[i] = value
+    
+    result = {key: value for key, value in metric_result.items() if key != 'datapoints'}
+    result['columns'] = columns
+    return result
+
+
+def to_columnar_metrics(metrics_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of per-resource metrics with every metric in columnar form"""
+    return {
+        **metrics_data,
+        'metrics': {key: to_columnar(result) for key, result in metrics_data['metrics'].items()}
+    }
+
+
+def align_to_period(timestamp: datetime, period: int) -> datetime:
+    """
+    Round a naive UTC datetime down to a multiple of period seconds
+    
+    Args:
+        timestamp: Naive UTC datetime
+        period: Period in seconds
+    
+    Returns:
+        Aligned datetime
+    """
+    offset = int((timestamp - _EPOCH).total_seconds()) % period
+    return timestamp.replace(microsecond=0) - timedelta(seconds=offset)
+
+
+def parse_time_range(hours: int = 24, window: Optional[int] = None) -> tuple:
     """
     Parse time range for metrics query
     
+    The end time is truncated to the minute, or aligned down to the window
+    when one is given, so repeated requests share the same range. Keep the
+    window short: everything after the aligned end is left out.
+    
     Args:
         hours: Number of hours to look back
+        window: Optional window in seconds to align the end time to
     
     Returns:
         Tuple of (start_time, end_time)
     """
-    end_time = datetime.utcnow()
+    end_time = datetime.utcnow().replace(second=0, microsecond=0)
+    if window:
+        end_time = align_to_period(end_time, window)
     start_time = end_time - timedelta(hours=hours)
     return start_time, end_time
 
@@ -200,11 +702,5 @@ def calculate_period(hours: int) -> int:
     Returns:
         Period in seconds
     """
-    if hours <= 3:
-        return 60  # 1 minute
-    elif hours <= 24:
-        return 300  # 5 minutes
-    elif hours <= 168:  # 7 days
-        return 3600  # 1 hour
-    else:
-        return 86400  # 1 day
+    # Ranges are inclusive of their upper bound, hence bisect_left
+    return _PERIODS[bisect_left(_PERIOD_BOUNDS_HOURS, hours)]
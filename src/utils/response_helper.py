@@ -4,8 +4,60 @@ Utilities for formatting Lambda API Gateway responses
 """
 
 import json
-from typing import Any, Dict, Optional
-from datetime import datetime
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Optional, Union
+from datetime import datetime, timezone
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
+# Headers shared by every response; never mutated, custom headers are merged
+# into a copy. Kept a plain dict because the Lambda runtime JSON-encodes it.
+_DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
+    'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
+}
+
+
+def dumps(body: Any) -> str:
+    """
+    Serialize a response body to a JSON string, using orjson when available
+    
+    Args:
+        body: Object to serialize
+    
+    Returns:
+        JSON string
+    """
+    if orjson is not None:
+        return orjson.dumps(body, default=json_serializer).decode()
+    return json.dumps(body, default=json_serializer)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON request body, using orjson when available
+    
+    Both parsers raise json.JSONDecodeError (or a subclass) on invalid input.
+    
+    Args:
+        data: JSON string or bytes
+    
+    Returns:
+        Parsed object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _now_iso() -> str:
+    """Current UTC time as an ISO 8601 string with second precision"""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
 
 
 def create_response(
@@ -24,20 +76,12 @@ def create_response(
     Returns:
         API Gateway response dictionary
     """
-    default_headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key',
-        'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-    }
-    
-    if headers:
-        default_headers.update(headers)
+    response_headers = {**_DEFAULT_HEADERS, **headers} if headers else _DEFAULT_HEADERS
     
     return {
         'statusCode': status_code,
-        'headers': default_headers,
-        'body': json.dumps(body, default=json_serializer)
+        'headers': response_headers,
+        'body': dumps(body)
     }
 
 
@@ -58,7 +102,7 @@ def success_response(data: Any, message: str = "Success") -> Dict[str, Any]:
             'status': 'success',
             'message': message,
             'data': data,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _now_iso()
         }
     )
 
@@ -82,7 +126,7 @@ def error_response(
     body = {
         'status': 'error',
         'message': message,
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': _now_iso()
     }
     
     if error_code:
@@ -106,7 +150,7 @@ def validation_error(message: str, field: Optional[str] = None) -> Dict[str, Any
         'status': 'error',
         'message': message,
         'error_code': 'VALIDATION_ERROR',
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': _now_iso()
     }
     
     if field:
@@ -131,12 +175,12 @@ def not_found_response(resource: str) -> Dict[str, Any]:
             'status': 'error',
             'message': f'{resource} not found',
             'error_code': 'NOT_FOUND',
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': _now_iso()
         }
     )
 
 
-def json_serializer(obj: Any) -> str:
+def json_serializer(obj: Any) -> Any:
     """
     Custom JSON serializer for objects not serializable by default json code
     
@@ -144,8 +188,10 @@ def json_serializer(obj: Any) -> str:
         obj: Object to serialize
     
     Returns:
-        String representation
+        JSON-serializable representation
     """
     if isinstance(obj, datetime):
         return obj.isoformat()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return asdict(obj)
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
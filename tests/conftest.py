@@ -0,0 +1,12 @@
+"""
+Shared pytest configuration
+Makes the Lambda source root importable the way the runtime sees it
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# Handlers create their AWS clients at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
@@ -0,0 +1,148 @@
+"""
+Tests for the CloudWatch helper time range handling
+"""
+
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from utils import cloudwatch_helper  # noqa: E402
+from utils.cloudwatch_helper import CloudWatchHelper  # noqa: E402
+
+NOW = datetime(2026, 10, 15, 21, 43)
+
+
+class StubCloudWatch:
+    """Records the GetMetricData and GetMetricStatistics calls made"""
+    
+    def __init__(self):
+        self.meta = types.SimpleNamespace(region_name='us-east-1')
+        self.calls = []
+    
+    def get_paginator(self, operation):
+        assert operation == 'get_metric_data'
+        return self
+    
+    def paginate(self, **kwargs):
+        self.calls.append(kwargs)
+        yield {'MetricDataResults': []}
+    
+    def get_metric_statistics(self, **kwargs):
+        self.calls.append(kwargs)
+        return {'Datapoints': []}
+
+
+@pytest.fixture
+def helper():
+    cloudwatch_helper._CACHE.clear()
+    cw_helper = CloudWatchHelper.__new__(CloudWatchHelper)
+    cw_helper.cloudwatch = StubCloudWatch()
+    return cw_helper
+
+
+def queried_range(cw_helper, start_time, end_time, period):
+    """Run a one-metric batch and return the (StartTime, EndTime) sent to CloudWatch"""
+    request = {
+        'namespace': 'AWS/Lambda',
+        'metric_name': 'Invocations',
+        'dimensions': [{'Name': 'FunctionName', 'Value': 'f1'}],
+        'statistics': ['Sum']
+    }
+    cw_helper.get_metric_statistics_batch({'f1': request}, start_time, end_time, period)
+    call = cw_helper.cloudwatch.calls[-1]
+    return call['StartTime'], call['EndTime']
+
+
+@pytest.mark.parametrize('hours', [5, 24, 720])
+def test_single_period_range_is_not_shifted(helper, hours):
+    # All-resource summaries use one period spanning the whole range
+    start_time = NOW - timedelta(hours=hours)
+    assert queried_range(helper, start_time, NOW, hours * 3600) == (start_time, NOW)
+
+
+def test_range_is_widened_to_period_boundaries(helper):
+    assert queried_range(helper, NOW - timedelta(hours=24), NOW, 300) == (
+        datetime(2026, 10, 14, 21, 40),
+        datetime(2026, 10, 15, 21, 45)
+    )
+
+
+def test_daily_period_keeps_latest_day(helper):
+    # S3 storage metrics are stamped at midnight; today's point must stay in range
+    end_time = datetime(2026, 10, 15, 21, 0)
+    assert queried_range(helper, end_time - timedelta(hours=48), end_time, 86400) == (
+        datetime(2026, 10, 13),
+        datetime(2026, 10, 16)
+    )
+
+
+def test_aligned_range_is_unchanged(helper):
+    end_time = datetime(2026, 10, 15, 21, 0)
+    start_time = datetime(2026, 10, 14, 21, 0)
+    assert queried_range(helper, start_time, end_time, 3600) == (start_time, end_time)
+
+
+@pytest.mark.parametrize('hours', [1, 24, 200, 720])
+def test_parse_time_range_keeps_newest_data(monkeypatch, hours):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return NOW
+    
+    monkeypatch.setattr(cloudwatch_helper, 'datetime', FrozenDatetime)
+    start_time, end_time = cloudwatch_helper.parse_time_range(hours, cloudwatch_helper.TIME_RANGE_WINDOW_SECONDS)
+    assert end_time == datetime(2026, 10, 15, 21, 40)
+    assert end_time - start_time == timedelta(hours=hours)
+
+
+def test_repeated_batch_is_served_from_cache(helper):
+    start_time = NOW - timedelta(hours=24)
+    first = queried_range(helper, start_time, NOW, 300)
+    assert queried_range(helper, start_time, NOW, 300) == first
+    assert len(helper.cloudwatch.calls) == 1
+
+
+@pytest.mark.parametrize('hours, period', [
+    (1, 60), (3, 60), (4, 300), (24, 300), (25, 3600), (168, 3600), (169, 86400), (720, 86400)
+])
+def test_calculate_period_tiers_include_upper_bound(hours, period):
+    assert cloudwatch_helper.calculate_period(hours) == period
+
+
+def test_duplicate_requests_share_one_call(helper):
+    request = {
+        'namespace': 'AWS/Lambda',
+        'metric_name': 'Invocations',
+        'dimensions': [{'Name': 'FunctionName', 'Value': 'f1'}],
+        'start_time': NOW - timedelta(hours=24),
+        'end_time': NOW,
+        'period': 300
+    }
+    other = {**request, 'metric_name': 'Errors'}
+    results = helper.get_metric_statistics_many([request, other, dict(request)])
+    
+    assert [result['metric_name'] for result in results] == ['Invocations', 'Errors', 'Invocations']
+    assert results[0] is results[2]
+    assert len(helper.cloudwatch.calls) == 2
+
+
+def test_to_columnar_fills_missing_fields_with_none():
+    metric_result = {
+        'metric_name': 'Duration',
+        'datapoints': [
+            {'Timestamp': NOW, 'Average': 1.0},
+            {'Timestamp': NOW + timedelta(hours=1), 'Maximum': 5.0}
+        ]
+    }
+    result = cloudwatch_helper.to_columnar(metric_result)
+    
+    assert 'datapoints' not in result
+    assert result['columns'] == {
+        'Timestamp': [NOW, NOW + timedelta(hours=1)],
+        'Average': [1.0, None],
+        'Maximum': [None, 5.0]
+    }
+    assert 'datapoints' in metric_result
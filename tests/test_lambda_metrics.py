@@ -0,0 +1,43 @@
+"""
+Tests for the Lambda all-functions summary
+"""
+
+import pytest
+
+pytest.importorskip('boto3')
+
+from handlers import lambda_metrics  # noqa: E402
+
+INVOCATIONS = {'f1': 5.0, 'f2': 50.0, 'f3': 0.0, 'f4': 20.0}
+
+
+class StubHelper:
+    """Returns one Sum datapoint per function and metric"""
+    
+    def get_metric_statistics_batch(self, metric_requests, start_time=None, end_time=None, period=3600):
+        return {
+            (function_name, metric_name): {
+                'datapoints': [{'Sum': INVOCATIONS[function_name], 'Average': 1.0}]
+            }
+            for function_name, metric_name in metric_requests
+        }
+
+
+@pytest.fixture(autouse=True)
+def functions(monkeypatch):
+    monkeypatch.setattr(
+        lambda_metrics, 'get_all_functions_cached',
+        lambda: [{'name': name, 'code_size': 1} for name in INVOCATIONS]
+    )
+
+
+@pytest.mark.parametrize('top, expected', [
+    (0, ['f2', 'f4', 'f1', 'f3']),
+    (2, ['f2', 'f4']),
+    (10, ['f2', 'f4', 'f1', 'f3'])
+])
+def test_functions_ordered_by_invocations(top, expected):
+    summary = lambda_metrics.get_all_functions_summary(24, cw_helper=StubHelper(), top=top)
+    
+    assert [function.name for function in summary['functions']] == expected
+    assert summary['aggregated']['total_invocations'] == sum(INVOCATIONS.values())